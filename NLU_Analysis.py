@@ -1,10 +1,11 @@
 import streamlit as st
 import google.generativeai as genai
-import json,io,os
+import json,os
 import tempfile
-from streamlit_mic_recorder import mic_recorder
-import speech_recognition as sr
+from voice_recorder import voice_input
 from dotenv import load_dotenv
+import rate_limiter
+from rate_limiter import RateLimitBusy
 def main():
     # ------------------------
     # Configure Gemini API
@@ -67,27 +68,10 @@ def main():
     st.markdown("Enter a financial query below. The NLU will detect intent, entities, sentiment, categories, amounts, dates, and more.")
     # 🎤 Voice Recorder
     st.markdown("#### 🎙 Speak your query:")
-    audio_data = mic_recorder(
-        start_prompt="🎙 Start Recording",
-        stop_prompt="⏹ Stop Recording",
-        just_once=True,
-        use_container_width=True,
-        format="wav"  # <— record as WAV instead of WebM
-    )
-
-    if audio_data:
-       try:
-        wav_bytes = io.BytesIO(audio_data["bytes"])
-        recognizer = sr.Recognizer()
-        with sr.AudioFile(wav_bytes) as source:
-            audio = recognizer.record(source)
-        text = recognizer.recognize_google(audio)
+    text = voice_input(use_container_width=True)
+    if text:
         st.session_state.voice_text = text
         st.success(f"Recognized Speech: {text}")
-
-
-       except Exception as e:
-            st.error(f"Speech recognition error: {e}")
     # ------------------------
     # User Input
     # ------------------------
@@ -121,8 +105,9 @@ def main():
     """
 
                 try:
-                    model = genai.GenerativeModel("gemini-2.5-flash")  # Or latest model
-                    response = model.generate_content(prompt)
+                    model_name = "gemini-2.5-flash"  # Or latest model
+                    rate_limiter.acquire(api_key, model_name)  # Shared quota across all sessions
+                    response = genai.GenerativeModel(model_name).generate_content(prompt)
 
                     result_text = response.candidates[0].content.parts[0].text.strip()
 
@@ -185,6 +170,9 @@ def main():
 
                     st.session_state.context += f"\nUser: {user_query}\nNLU: {json.dumps(data)}"
 
+                except RateLimitBusy:
+                    st.warning(rate_limiter.BUSY_MESSAGE)
+
                 except json.JSONDecodeError:
                     st.error("AI did not return valid JSON. See raw output below:")
                     st.code(result_text)
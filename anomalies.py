@@ -0,0 +1,142 @@
+"""Spending spike detection: batch (vectorized) over a DataFrame, or online at insert time.
+
+    python anomalies.py rebuild    # recompute category_stats from all transactions
+
+A spike is an amount more than 2 standard deviations above its category's mean,
+for categories with at least MIN_COUNT transactions. On a database that predates
+category_stats, the first insert backfills it (see rollups.backfill_once).
+"""
+import numpy as np
+
+STATS = "category_stats"
+MIN_COUNT = 3
+SIGMAS = 2
+
+def _message(category, amount, when):
+    return f"🚩 **Anomaly Detected**: Unusual spike in **{category}** (₹{amount}) on {when}"
+
+# --- BATCH ---
+def detect_anomalies_loop(df):
+    """Original per-category loop; kept as the reference for detect_anomalies_pro."""
+    anomalies = []
+    if len(df) < 3:
+        return anomalies
+
+    for category in df['category'].unique():
+        cat_df = df[df['category'] == category]
+        if len(cat_df) >= 3:
+            mean = cat_df['amount'].mean()
+            std = cat_df['amount'].std()
+            # Identify spending 2 standard deviations above the mean
+            spikes = cat_df[cat_df['amount'] > (mean + 2 * std)]
+            for _, row in spikes.iterrows():
+                anomalies.append(_message(category, row['amount'], row['date']))
+    return anomalies
+
+def detect_anomalies_pro(df):
+    """Pro Feature: Identifies transactions that are statistically unusual.
+
+    One groupby pass instead of one filter per category; same messages in the
+    same order as detect_anomalies_loop (categories by first appearance, rows
+    in frame order).
+    """
+    if len(df) < 3:
+        return []
+    grouped = df.groupby("category", sort=False)["amount"]
+    count, mean, std = grouped.transform("size"), grouped.transform("mean"), grouped.transform("std")
+    spikes = df[(count >= MIN_COUNT) & (df["amount"] > mean + SIGMAS * std)]
+    if spikes.empty:
+        return []
+    cat_order = df["category"].drop_duplicates().reset_index(drop=True)
+    rank = spikes["category"].map({c: i for i, c in enumerate(cat_order)}).to_numpy()
+    order = np.argsort(rank, kind="stable")  # Category first, frame order within it
+    cats, amounts, dates = (spikes[c].to_numpy(dtype=object)[order] for c in ("category", "amount", "date"))
+    return [_message(c, a, d) for c, a, d in zip(cats, amounts, dates)]
+
+# --- ONLINE (Welford) ---
+# category_stats: {"_id": category, "n": count, "mean": running mean, "m2": sum of squared deviations}
+def welford_update(state, x):
+    """(n, mean, m2) after adding x."""
+    n, mean, m2 = state
+    n += 1
+    delta = x - mean
+    mean += delta / n
+    return n, mean, m2 + delta * (x - mean)
+
+def is_spike(state, x):
+    """Compares x with the statistics of the transactions before it."""
+    n, mean, m2 = state
+    return n >= MIN_COUNT and x > mean + SIGMAS * (m2 / (n - 1)) ** 0.5
+
+def _welford_pipeline(x):
+    # A single $set stage sees only the old values, so every field is written in terms of them.
+    n0, mean0, m20 = {"$ifNull": ["$n", 0]}, {"$ifNull": ["$mean", 0.0]}, {"$ifNull": ["$m2", 0.0]}
+    delta = {"$subtract": [x, mean0]}
+    n1 = {"$add": [n0, 1]}
+    return [{"$set": {
+        "n": n1,
+        "mean": {"$add": [mean0, {"$divide": [delta, n1]}]},
+        "m2": {"$add": [m20, {"$divide": [{"$multiply": [delta, delta, n0]}, n1]}]},
+    }}]
+
+def record_and_flag(db, doc):
+    """Folds a new transaction into its category's stats; returns an alert message or None.
+
+    One atomic round trip: concurrent inserts can't lose updates, and the
+    document returned is the state just before this transaction.
+    """
+    from pymongo import ReturnDocument
+    from rollups import backfill_once
+    if backfill_once(db, STATS, rebuild_stats):
+        return None  # Stats were just rebuilt with this transaction in them; no before-state to compare with
+    before = db[STATS].find_one_and_update(
+        {"_id": doc["category"]}, _welford_pipeline(float(doc["amount"])),
+        upsert=True, return_document=ReturnDocument.BEFORE,
+    )
+    state = (before["n"], before["mean"], before["m2"]) if before else (0, 0.0, 0.0)
+    return _message(doc["category"], doc["amount"], doc["date"]) if is_spike(state, doc["amount"]) else None
+
+def _merge_pipeline(n_b, mean_b, m2_b):
+    # Chan et al. parallel combine of the stored stats (a) with a batch (b).
+    n_a, mean_a, m2_a = {"$ifNull": ["$n", 0]}, {"$ifNull": ["$mean", 0.0]}, {"$ifNull": ["$m2", 0.0]}
+    delta = {"$subtract": [mean_b, mean_a]}
+    n = {"$add": [n_a, n_b]}
+    return [{"$set": {
+        "n": n,
+        "mean": {"$add": [mean_a, {"$divide": [{"$multiply": [delta, n_b]}, n]}]},
+        "m2": {"$add": [m2_a, m2_b, {"$divide": [{"$multiply": [delta, delta, n_a, n_b]}, n]}]},
+    }}]
+
+def record_batch(db, docs):
+    """Folds many new transactions into category_stats with one update per category."""
+    from pymongo import UpdateOne
+    from rollups import backfill_once
+    if backfill_once(db, STATS, rebuild_stats):
+        return  # The rebuild already folded these in
+    batches = {}
+    for doc in docs:
+        batches[doc["category"]] = welford_update(batches.get(doc["category"], (0, 0.0, 0.0)), float(doc["amount"]))
+    ops = [UpdateOne({"_id": c}, _merge_pipeline(*state), upsert=True) for c, state in batches.items()]
+    if ops:
+        db[STATS].bulk_write(ops, ordered=False)
+
+def rebuild_stats(db):
+    """Recomputes category_stats from every transaction (backfill / repair)."""
+    db.transactions.aggregate([
+        {"$group": {"_id": "$category", "n": {"$sum": 1}, "mean": {"$avg": "$amount"},
+                    "std_pop": {"$stdDevPop": "$amount"}}},
+        {"$project": {"n": 1, "mean": 1, "m2": {"$multiply": ["$std_pop", "$std_pop", "$n"]}}},
+        {"$out": STATS},
+    ], allowDiskUse=True)
+    from rollups import mark_built
+    mark_built(db, STATS)
+    return db[STATS].count_documents({})
+
+if __name__ == "__main__":
+    import argparse
+    from db_utils import get_db
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+    print(f"Rebuilt stats for {rebuild_stats(get_db())} categories")
@@ -0,0 +1,83 @@
+"""Budget page load: whole history into pandas vs a month-scoped $group in MongoDB.
+
+    python benchmark_budget_aggregation.py --uri mongodb://localhost:27017 --docs 1000000
+
+"before" is what budget_summaries used to do (find() everything, groupby in
+pandas); "after" is budget_summaries.category_totals_pipeline for one month,
+with db_utils.REQUIRED_INDEXES in place. Runs on a throwaway database.
+"""
+import argparse, json, random, statistics, time
+from datetime import date, timedelta
+import pandas as pd
+from pymongo import MongoClient
+from budget_summaries import category_totals_pipeline, month_range
+from db_utils import TRANSACTION_FIELDS, ensure_indexes
+
+CATEGORIES = ["Food", "Rent", "Travel", "Shopping", "Entertainment", "Savings", "Investments", "Others"]
+YEARS = 5
+
+def seed(coll, docs, batch_size=20000):
+    rng = random.Random(0)
+    start = date.today() - timedelta(days=365 * YEARS)
+    batch = []
+    for _ in range(docs):
+        day = start + timedelta(days=rng.randrange(365 * YEARS))
+        batch.append({"date": day.isoformat(), "category": rng.choice(CATEGORIES), "amount": round(rng.uniform(50, 5000), 2)})
+        if len(batch) == batch_size:
+            coll.insert_many(batch)
+            batch = []
+    if batch:
+        coll.insert_many(batch)
+
+def before(coll, start_date, end_date):
+    df = pd.DataFrame(list(coll.find({}, TRANSACTION_FIELDS)))
+    return df.groupby("category")["amount"].sum().to_dict(), len(df)
+
+def after(coll, start_date, end_date):
+    rows = list(coll.aggregate(category_totals_pipeline(start_date, end_date)))
+    return {r["_id"]: r["total"] for r in rows}, len(rows)
+
+def timed(fn, repeats, *args):
+    fn(*args)  # Warm the cache
+    times, result = [], None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn(*args)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="fibot_budget_bench")
+    parser.add_argument("--docs", type=int, default=1_000_000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--out", default="bench_budget_aggregation.json")
+    args = parser.parse_args()
+
+    client = MongoClient(args.uri)
+    client.drop_database(args.db)
+    db = client[args.db]
+    try:
+        start = time.perf_counter()
+        seed(db.transactions, args.docs)
+        print(f"Seeded {args.docs} transactions over {YEARS} years in {time.perf_counter() - start:.0f}s")
+        ensure_indexes(db)
+        start_date, end_date = month_range(date.today().replace(day=1) - timedelta(days=1))  # Last full month
+
+        before_s, (_, before_docs) = timed(before, args.repeats, db.transactions, start_date, end_date)
+        after_s, (totals, after_docs) = timed(after, args.repeats, db.transactions, start_date, end_date)
+        plan = db.command("explain", {"aggregate": "transactions", "cursor": {},
+                                      "pipeline": category_totals_pipeline(start_date, end_date)}, verbosity="executionStats")
+    finally:
+        client.drop_database(args.db)
+
+    print(f"before: {before_s * 1000:8.0f} ms, {before_docs} documents to the app (whole history)")
+    print(f" after: {after_s * 1000:8.0f} ms, {after_docs} documents to the app ({start_date}..{end_date})")
+    print(f"speedup x{before_s / after_s:.0f}")
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({"timestamp": time.time(), "docs": args.docs, "period": [start_date, end_date],
+                   "before_ms": before_s * 1000, "before_docs": before_docs,
+                   "after_ms": after_s * 1000, "after_docs": after_docs,
+                   "month_totals": totals, "explain": plan}, f, indent=2, default=str)
+    print(f"Wrote {args.out}")
@@ -0,0 +1,73 @@
+"""Query-embedding micro-benchmark: HuggingFace (PyTorch) vs ONNX MiniLM.
+
+    python benchmark_embeddings.py --backends hf onnx --out bench_embeddings.json
+
+Reports cold per-query latency (no cache), cached-hit latency, batch
+throughput, and how closely the ONNX vectors match the HuggingFace ones.
+"""
+import argparse, json, time
+import numpy as np
+from embedding_backend import CachedQueryEmbeddings, get_embeddings
+from granite_llm import FINANCE_QUESTIONS
+
+def _ms(samples, q):
+    return float(np.percentile(samples, q) * 1000)
+
+def bench_backend(backend, batch_texts, repeats):
+    cached = get_embeddings(backend)
+    base = cached.base
+    base.embed_query("warm up")
+
+    cold = []
+    for _ in range(repeats):
+        for q in FINANCE_QUESTIONS:
+            t0 = time.perf_counter()
+            base.embed_query(q)
+            cold.append(time.perf_counter() - t0)
+
+    warm_cache = CachedQueryEmbeddings(base)
+    for q in FINANCE_QUESTIONS:
+        warm_cache.embed_query(q)
+    hits = []
+    for q in FINANCE_QUESTIONS:
+        t0 = time.perf_counter()
+        warm_cache.embed_query(f"  {q.upper()} ")  # Same key after normalisation
+        hits.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    vectors = base.embed_documents(batch_texts)
+    batch_s = time.perf_counter() - t0
+    return {
+        "backend": backend,
+        "query_p50_ms": _ms(cold, 50),
+        "query_p99_ms": _ms(cold, 99),
+        "cache_hit_p50_ms": _ms(hits, 50),
+        "batch_texts_per_sec": len(batch_texts) / batch_s,
+    }, np.asarray(vectors, dtype="float32")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["hf", "onnx"])
+    parser.add_argument("--batch", type=int, default=512, help="Texts in the bulk-embedding run")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--out", default="bench_embeddings.json")
+    args = parser.parse_args()
+
+    # Deterministic chunk-sized texts for the throughput run.
+    batch_texts = [f"{FINANCE_QUESTIONS[i % len(FINANCE_QUESTIONS)]} " * 12 for i in range(args.batch)]
+    results, vectors = [], {}
+    for backend in args.backends:
+        row, vectors[backend] = bench_backend(backend, batch_texts, args.repeats)
+        results.append(row)
+        print(f"{backend:>5}: query p50 {row['query_p50_ms']:.2f}ms p99 {row['query_p99_ms']:.2f}ms | "
+              f"cache hit {row['cache_hit_p50_ms'] * 1000:.1f}us | batch {row['batch_texts_per_sec']:.0f} texts/s")
+
+    if "hf" in vectors and "onnx" in vectors:
+        cos = (vectors["hf"] * vectors["onnx"]).sum(axis=1)
+        for row in results:
+            row["min_cosine_vs_hf"] = float(cos.min())
+        print(f"ONNX vs HF: min cosine {cos.min():.5f}")
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({"timestamp": time.time(), "results": results}, f, indent=2)
+    print(f"Wrote {args.out}")
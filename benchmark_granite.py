@@ -0,0 +1,206 @@
+"""Granite CPU benchmarks on the fixed finance question set.
+
+    python benchmark_granite.py precision --modes fp32 bf16 int8 --out bench_granite.json
+    python benchmark_granite.py prefix --out bench_prefix.json
+    python benchmark_granite.py assisted --draft ibm-granite/granite-3.1-1b-a400m-instruct
+
+Each precision mode loads in its own subprocess so load time and resident memory are
+measured from a cold start, not polluted by the previous mode.
+"""
+import argparse, difflib, json, os, resource, subprocess, sys, time
+
+def _rss_mb():
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _generate(model, tokenizer, prompt, max_new_tokens, **kwargs):
+    """Greedy generation; returns (text, new_token_count, seconds)."""
+    import torch
+    inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+    start = time.perf_counter()
+    with torch.no_grad():
+        out = model.generate(**inputs, max_new_tokens=max_new_tokens, do_sample=False, **kwargs)
+    elapsed = time.perf_counter() - start
+    new_tokens = out[0, inputs["input_ids"].shape[1]:]
+    return tokenizer.decode(new_tokens, skip_special_tokens=True).strip(), len(new_tokens), elapsed
+
+def agreement(answers, baseline):
+    """Exact-match rate and mean character-level similarity against the baseline answers."""
+    exact = sum(a == b for a, b in zip(answers, baseline))
+    ratio = sum(difflib.SequenceMatcher(None, a, b).ratio() for a, b in zip(answers, baseline))
+    return {"exact_match": exact / len(baseline), "similarity": ratio / len(baseline)}
+
+# --- PRECISION SUITE ---
+def precision_child(mode, max_new_tokens):
+    from granite_llm import FINANCE_QUESTIONS, build_prompt, load_granite
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    model, tokenizer = load_granite(precision=mode)
+    load_s = time.perf_counter() - start
+    rss_loaded = _rss_mb()
+
+    answers, tokens, seconds = [], 0, 0.0
+    for q in FINANCE_QUESTIONS:
+        text, n, elapsed = _generate(model, tokenizer, build_prompt("No relevant context found.", q), max_new_tokens)
+        answers.append(text)
+        tokens += n
+        seconds += elapsed
+    return {
+        "mode": mode,
+        "load_s": load_s,
+        "rss_mb": rss_loaded,
+        "model_rss_mb": rss_loaded - rss_before,
+        "tokens_per_sec": tokens / seconds if seconds else 0.0,
+        "answers": answers,
+    }
+
+def run_precision(args):
+    results = []
+    for mode in args.modes:
+        cmd = [sys.executable, __file__, "precision-child", "--mode", mode, "--max-new-tokens", str(args.max_new_tokens)]
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True, env=dict(os.environ))
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    baseline = next((r["answers"] for r in results if r["mode"] == "fp32"), None)
+    for r in results:
+        if baseline:
+            r["agreement_vs_fp32"] = agreement(r["answers"], baseline)
+        agree = r.get("agreement_vs_fp32", {})
+        print(f"{r['mode']:>5}: load {r['load_s']:.1f}s | RSS {r['rss_mb']:.0f} MB | "
+              f"{r['tokens_per_sec']:.2f} tok/s | exact {agree.get('exact_match', float('nan')):.0%} "
+              f"| similarity {agree.get('similarity', float('nan')):.2f}")
+    return results
+
+# --- PREFIX KV-CACHE SUITE ---
+# Stand-in for two retrieved chunks, so the measured prefill has a realistic length.
+SAMPLE_CONTEXT = (
+    "A Systematic Investment Plan (SIP) invests a fixed amount in a mutual fund at regular intervals. "
+    "It averages the purchase cost over market cycles and builds discipline.\n\n---\n\n"
+    "An emergency fund should cover three to six months of essential expenses and be kept in liquid, "
+    "low-risk instruments such as a savings account or a liquid fund."
+)
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def run_prefix(args):
+    from granite_llm import FINANCE_QUESTIONS, GraniteGenerator, build_prompt, load_granite
+    model, tokenizer = load_granite()
+    plain = GraniteGenerator(model, tokenizer, use_prefix_cache=False)
+    cached, setup_s = _timed(lambda: GraniteGenerator(model, tokenizer, use_prefix_cache=True))
+    prefix_tokens = cached.prefix_cache.prefix_ids.shape[1]
+
+    rows = []
+    for q in FINANCE_QUESTIONS:
+        prompt = build_prompt(SAMPLE_CONTEXT, q)
+        # Warm both paths for this prompt length
+        plain.generate(prompt, max_new_tokens=1)
+        cached.generate(prompt, max_new_tokens=1)
+        # One new token is (almost) pure prefill.
+        _, plain_s = _timed(lambda: plain.generate(prompt, max_new_tokens=1))
+        _, cached_s = _timed(lambda: cached.generate(prompt, max_new_tokens=1))
+        same = plain.generate(prompt, args.max_new_tokens) == cached.generate(prompt, args.max_new_tokens)
+        rows.append({
+            "question": q,
+            "prompt_tokens": len(tokenizer(prompt).input_ids),
+            "prefill_ms": plain_s * 1000,
+            "prefill_cached_ms": cached_s * 1000,
+            "saved_ms": (plain_s - cached_s) * 1000,
+            "same_output": same,
+        })
+
+    saved = sum(r["saved_ms"] for r in rows) / len(rows)
+    print(f"Prefix: {prefix_tokens} tokens, cached once in {setup_s * 1000:.0f} ms")
+    print(f"Prefill saved per request: {saved:.1f} ms on average "
+          f"({sum(r['prefill_ms'] for r in rows) / len(rows):.1f} -> "
+          f"{sum(r['prefill_cached_ms'] for r in rows) / len(rows):.1f} ms); "
+          f"identical outputs: {sum(r['same_output'] for r in rows)}/{len(rows)}")
+    return {"prefix_tokens": prefix_tokens, "setup_ms": setup_s * 1000, "mean_saved_ms": saved, "requests": rows}
+
+# --- ASSISTED DECODING SUITE ---
+class _CallCounter:
+    """Counts top-level forward() calls of a model via a forward hook."""
+
+    def __init__(self, model):
+        self.calls = 0
+        self._handle = model.register_forward_hook(self._hook)
+
+    def _hook(self, module, inputs, output):
+        self.calls += 1
+
+    def reset(self):
+        self.calls = 0
+
+def run_assisted(args):
+    from granite_llm import DRAFT_MODEL, FINANCE_QUESTIONS, build_prompt, load_draft_model, load_granite
+    draft_name = args.draft or DRAFT_MODEL
+    model, tokenizer = load_granite()
+    draft = load_draft_model(model, tokenizer, draft_name)
+    target_calls, draft_calls = _CallCounter(model), _CallCounter(draft)
+
+    rows = []
+    for q in FINANCE_QUESTIONS:
+        prompt = build_prompt(SAMPLE_CONTEXT, q)
+        base_text, base_n, base_s = _generate(model, tokenizer, prompt, args.max_new_tokens)
+        target_calls.reset()
+        draft_calls.reset()
+        text, n, seconds = _generate(model, tokenizer, prompt, args.max_new_tokens, assistant_model=draft)
+        # Each verification pass keeps the accepted draft tokens plus one token of its own.
+        accepted = max(n - target_calls.calls, 0)
+        rows.append({
+            "question": q,
+            "baseline_tok_s": base_n / base_s,
+            "assisted_tok_s": n / seconds,
+            "speedup": (n / seconds) / (base_n / base_s),
+            "verify_passes": target_calls.calls,
+            "draft_tokens": draft_calls.calls,
+            "acceptance_rate": accepted / draft_calls.calls if draft_calls.calls else 0.0,
+            "identical_output": text == base_text,
+        })
+
+    mean = lambda key: sum(r[key] for r in rows) / len(rows)
+    print(f"Draft {draft_name}: {mean('baseline_tok_s'):.2f} -> {mean('assisted_tok_s'):.2f} tok/s "
+          f"(x{mean('speedup'):.2f}), acceptance {mean('acceptance_rate'):.0%}, "
+          f"identical greedy output {sum(r['identical_output'] for r in rows)}/{len(rows)}")
+    return {"draft_model": draft_name, "mean_speedup": mean("speedup"),
+            "mean_acceptance_rate": mean("acceptance_rate"), "requests": rows}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="suite", required=True)
+
+    p = sub.add_parser("precision", help="fp32 vs bf16 vs int8: load time, RSS, tokens/sec, answer agreement")
+    p.add_argument("--modes", nargs="+", default=["fp32", "bf16", "int8"])
+    p.add_argument("--max-new-tokens", type=int, default=64)
+    p.add_argument("--out", default="bench_granite.json")
+
+    c = sub.add_parser("precision-child")
+    c.add_argument("--mode", required=True)
+    c.add_argument("--max-new-tokens", type=int, default=64)
+
+    x = sub.add_parser("prefix", help="Prefill time per request with and without the prompt-prefix KV cache")
+    x.add_argument("--max-new-tokens", type=int, default=32, help="Length of the output-equality check")
+    x.add_argument("--out", default="bench_prefix.json")
+
+    a = sub.add_parser("assisted", help="tokens/sec and acceptance rate with a draft model")
+    a.add_argument("--draft", default=None, help="Draft model (defaults to FIBOT_DRAFT_MODEL)")
+    a.add_argument("--max-new-tokens", type=int, default=128)
+    a.add_argument("--out", default="bench_assisted.json")
+
+    args = parser.parse_args()
+    if args.suite == "precision-child":
+        print(json.dumps(precision_child(args.mode, args.max_new_tokens)))
+    else:
+        runner = {"precision": run_precision, "prefix": run_prefix, "assisted": run_assisted}[args.suite]
+        report = {"suite": args.suite, "timestamp": time.time(), "results": runner(args)}
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.out}")
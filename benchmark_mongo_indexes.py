@@ -0,0 +1,139 @@
+"""Explain plans and latency of Fibot's MongoDB read paths, without and with REQUIRED_INDEXES.
+
+    python benchmark_mongo_indexes.py --uri mongodb://localhost:27017 --docs 200000
+    python benchmark_mongo_indexes.py --mongomock      # no server: latency only, no plans
+
+Seeds a throwaway database (dropped afterwards), runs every query with only the
+_id index, then again after db_utils.ensure_indexes().
+"""
+import argparse, json, random, statistics, time
+from datetime import datetime, timedelta
+from db_utils import GOAL_FIELDS, HISTORY_LIST_FIELDS, REQUIRED_INDEXES, TRANSACTION_FIELDS, ensure_indexes
+
+CATEGORIES = ["Food", "Rent", "Travel", "Shopping", "Entertainment", "Savings", "Investments", "Investment", "Others"]
+
+# name -> (collection, find spec or aggregation pipeline); mirrors the pages' queries
+QUERIES = {
+    "sidebar_history": ("search_history", {"filter": {}, "projection": HISTORY_LIST_FIELDS, "sort": {"timestamp": -1}, "limit": 12}),
+    "transactions_by_date": ("transactions", {"filter": {}, "projection": TRANSACTION_FIELDS, "sort": {"date": -1}}),
+    "savings_total": ("transactions", [
+        {"$match": {"category": {"$in": ["Savings", "Investments", "Investment"]}}},
+        {"$group": {"_id": None, "total": {"$sum": "$amount"}}},
+    ]),
+    "goals": ("user_goals", {"filter": {}, "projection": GOAL_FIELDS, "sort": {"created_at": 1}}),
+}
+
+def seed(db, docs):
+    rng = random.Random(0)
+    start = datetime(2023, 1, 1)
+    batch = []
+    for i in range(docs):
+        day = start + timedelta(days=rng.randrange(3 * 365))
+        batch.append({"date": day.strftime("%Y-%m-%d"), "category": rng.choice(CATEGORIES),
+                      "amount": round(rng.uniform(50, 5000), 2), "timestamp": day})
+        if len(batch) == 10000:
+            db.transactions.insert_many(batch)
+            batch = []
+    if batch:
+        db.transactions.insert_many(batch)
+    db.search_history.insert_many([
+        {"question": f"Question {i}?", "answer": "x" * 2000, "timestamp": start + timedelta(minutes=i)}
+        for i in range(max(docs // 20, 100))
+    ])
+    db.user_goals.insert_many([
+        {"name": f"Goal {i}", "target": 1000 * (i + 1), "created_at": start + timedelta(days=i)} for i in range(200)
+    ])
+
+def run_query(db, coll, spec):
+    if isinstance(spec, list):
+        return list(db[coll].aggregate(spec))
+    cursor = db[coll].find(spec["filter"], spec["projection"]).sort(list(spec["sort"].items()))
+    if spec.get("limit"):
+        cursor = cursor.limit(spec["limit"])
+    return list(cursor)
+
+def _find_key(obj, key):
+    """First value stored under `key` anywhere in a nested explain document."""
+    if isinstance(obj, dict):
+        if key in obj:
+            return obj[key]
+        obj = list(obj.values())
+    if isinstance(obj, list):
+        for item in obj:
+            found = _find_key(item, key)
+            if found is not None:
+                return found
+    return None
+
+def _stages(plan):
+    out = []
+    while isinstance(plan, dict):
+        out.append(plan.get("stage", "?"))
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    return " > ".join(out)
+
+def explain(db, coll, spec):
+    if isinstance(spec, list):
+        cmd = {"aggregate": coll, "pipeline": spec, "cursor": {}}
+    else:
+        cmd = {"find": coll, "filter": spec["filter"], "projection": spec["projection"], "sort": spec["sort"]}
+        if spec.get("limit"):
+            cmd["limit"] = spec["limit"]
+    result = db.command("explain", cmd, verbosity="executionStats")
+    return {
+        "plan": _stages(_find_key(result, "winningPlan")),
+        "docs_examined": _find_key(result, "totalDocsExamined"),
+        "keys_examined": _find_key(result, "totalKeysExamined"),
+    }
+
+def measure(db, repeats, with_plans):
+    rows = {}
+    for name, (coll, spec) in QUERIES.items():
+        run_query(db, coll, spec)  # Warm the cache
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            run_query(db, coll, spec)
+            times.append(time.perf_counter() - start)
+        rows[name] = {"median_ms": statistics.median(times) * 1000}
+        if with_plans:
+            rows[name].update(explain(db, coll, spec))
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--mongomock", action="store_true", help="In-memory stand-in (no explain plans)")
+    parser.add_argument("--db", default="fibot_index_bench")
+    parser.add_argument("--docs", type=int, default=200000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--out", default="bench_mongo_indexes.json")
+    args = parser.parse_args()
+
+    if args.mongomock:
+        import mongomock
+        client = mongomock.MongoClient()
+    else:
+        from pymongo import MongoClient
+        client = MongoClient(args.uri)
+    client.drop_database(args.db)
+    db = client[args.db]
+    try:
+        seed(db, args.docs)
+        before = measure(db, args.repeats, with_plans=not args.mongomock)
+        ensure_indexes(db)
+        after = measure(db, args.repeats, with_plans=not args.mongomock)
+    finally:
+        client.drop_database(args.db)
+
+    for name in QUERIES:
+        b, a = before[name], after[name]
+        print(f"{name:>21}: {b['median_ms']:8.1f} -> {a['median_ms']:8.1f} ms", end="")
+        if "plan" in b:
+            print(f" | {b['plan']} ({b['docs_examined']} docs) -> {a['plan']} ({a['docs_examined']} docs)", end="")
+        print()
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({"timestamp": time.time(), "docs": args.docs, "indexes": REQUIRED_INDEXES,
+                   "before": before, "after": after}, f, indent=2, default=str)
+    print(f"Wrote {args.out}")
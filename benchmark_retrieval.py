@@ -0,0 +1,150 @@
+"""Retrieval benchmark for the chatbot's vector store: recall@k vs latency.
+
+    python benchmark_retrieval.py --chunk-sizes 300 500 800 --index-types flat ivf hnsw pq ivfpq
+    python benchmark_retrieval.py --compare bench_retrieval_prev.json
+
+Builds indexes over a fixed sample of the FiQA/Sujet corpora and scores each
+against exact (flat) search on the same chunks. Results are written as JSON so
+releases can be diffed.
+"""
+import argparse, json, subprocess, time
+from itertools import islice
+import numpy as np
+import faiss
+import index_builder
+
+DEFAULT_CHUNK_SIZES = [300, 500, 800]
+DEFAULT_INDEX_TYPES = ["flat", "ivf", "hnsw", "pq", "ivfpq"]
+PQ_M = 16
+
+def _factory(index_type, n):
+    nlist = max(1, min(int(4 * np.sqrt(n)), n // 39))
+    return {
+        "flat": ("Flat", {}),
+        "ivf": (f"IVF{nlist},Flat", {"nprobe": 16}),
+        "hnsw": ("HNSW32", {"efSearch": 64}),
+        "pq": (f"PQ{PQ_M}", {}),
+        "ivfpq": (f"IVF{nlist},PQ{PQ_M}", {"nprobe": 16}),
+    }[index_type]
+
+def load_sample(per_dataset, n_queries):
+    """First `per_dataset` rows of each corpus, plus held-out rows turned into queries."""
+    corpus, queries = [], []
+    for ds_name in index_builder.HF_DATASETS:
+        rows = list(islice(index_builder.iter_dataset_texts([ds_name]), per_dataset + n_queries))
+        corpus.extend(rows[:per_dataset])
+        # Short prefixes of unseen rows look like user questions and have no exact twin.
+        queries.extend(r[:200] for r in rows[per_dataset:])
+    return corpus, queries
+
+def _percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000)
+
+def bench_index(index_type, vectors, queries, truth, k):
+    key, params = _factory(index_type, len(vectors))
+    index = faiss.index_factory(vectors.shape[1], key)
+    start = time.perf_counter()
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    build_s = time.perf_counter() - start
+    for name, value in params.items():
+        faiss.ParameterSpace().set_index_parameter(index, name, value)
+
+    latencies, hits = [], 0
+    for i in range(len(queries)):
+        t0 = time.perf_counter()
+        _, ids = index.search(queries[i:i + 1], k)
+        latencies.append(time.perf_counter() - t0)
+        hits += len(set(ids[0]) & set(truth[i]))
+    return {
+        "index_type": index_type,
+        "factory": key,
+        "params": params,
+        "build_s": build_s,
+        "size_bytes": int(faiss.serialize_index(index).nbytes),
+        f"recall@{k}": hits / (len(queries) * k),
+        "p50_ms": _percentile_ms(latencies, 50),
+        "p99_ms": _percentile_ms(latencies, 99),
+    }
+
+def run(args, embeddings):
+    corpus, raw_queries = load_sample(args.per_dataset, args.queries)
+    queries = np.asarray(embeddings.embed_documents(raw_queries), dtype="float32")
+    results = []
+    for chunk_size in args.chunk_sizes:
+        chunks = list(index_builder.iter_chunks(corpus, chunk_size, chunk_size // 10))
+        t0 = time.perf_counter()
+        vectors = np.asarray(embeddings.embed_documents(chunks), dtype="float32")
+        embed_s = time.perf_counter() - t0
+
+        exact = faiss.IndexFlatL2(vectors.shape[1])
+        exact.add(vectors)
+        _, truth = exact.search(queries, args.k)
+        for index_type in args.index_types:
+            row = bench_index(index_type, vectors, queries, truth, args.k)
+            row.update(chunk_size=chunk_size, chunks=len(chunks), embed_s=embed_s)
+            results.append(row)
+            print(f"chunk={chunk_size:>4} {index_type:>6}: recall@{args.k}={row[f'recall@{args.k}']:.3f} "
+                  f"p50={row['p50_ms']:.2f}ms p99={row['p99_ms']:.2f}ms build={row['build_s']:.2f}s "
+                  f"size={row['size_bytes'] / 1e6:.1f}MB")
+    return results
+
+def compare(current, previous, k):
+    """Flags recall drops > 0.01 and p99 slowdowns > 20% against a previous run."""
+    prev = {(r["chunk_size"], r["index_type"]): r for r in previous["results"]}
+    regressions = []
+    for r in current["results"]:
+        old = prev.get((r["chunk_size"], r["index_type"]))
+        if not old:
+            continue
+        if r[f"recall@{k}"] < old.get(f"recall@{k}", 0) - 0.01:
+            regressions.append(f"{r['index_type']}@{r['chunk_size']}: recall {old[f'recall@{k}']:.3f} -> {r[f'recall@{k}']:.3f}")
+        if r["p99_ms"] > old["p99_ms"] * 1.2:
+            regressions.append(f"{r['index_type']}@{r['chunk_size']}: p99 {old['p99_ms']:.2f}ms -> {r['p99_ms']:.2f}ms")
+    return regressions
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+if __name__ == "__main__":
+    from embedding_backend import get_embeddings
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk-sizes", nargs="+", type=int, default=DEFAULT_CHUNK_SIZES)
+    parser.add_argument("--index-types", nargs="+", default=DEFAULT_INDEX_TYPES, choices=DEFAULT_INDEX_TYPES)
+    parser.add_argument("--per-dataset", type=int, default=2000, help="Corpus rows sampled from each dataset")
+    parser.add_argument("--queries", type=int, default=100, help="Held-out query rows per dataset")
+    parser.add_argument("-k", type=int, default=2, help="Matches TOP_K in rag_finance by default")
+    parser.add_argument("--embed-backend", default="hf", choices=["hf", "onnx"])
+    parser.add_argument("--out", default="bench_retrieval.json")
+    parser.add_argument("--compare", help="Previous results JSON to check for regressions")
+    args = parser.parse_args()
+
+    embeddings = get_embeddings(args.embed_backend, index_builder.EMBED_MODEL)
+    report = {
+        "meta": {
+            "git_commit": _git_commit(),
+            "timestamp": time.time(),
+            "embed_model": index_builder.EMBED_MODEL,
+            "embed_backend": args.embed_backend,
+            "per_dataset": args.per_dataset,
+            "queries_per_dataset": args.queries,
+            "k": args.k,
+            "faiss_version": faiss.__version__,
+        },
+        "results": run(args, embeddings),
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.out}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.k)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        raise SystemExit(1 if regressions else 0)
@@ -0,0 +1,57 @@
+"""Cold import cost of each main.py route, measured in fresh interpreters.
+
+    python benchmark_routes.py --repeats 3 --out bench_routes.json
+
+"home" is the cost the home page pays now that page modules load lazily
+(streamlit only); every other row is what a route adds on its first visit.
+"""
+import argparse, json, statistics, subprocess, sys, time
+
+ROUTE_MODULES = {
+    "chatbot": "rag_granite_finance",
+    "budget": "budget_summaries",
+    "spending": "spending_insights",
+    "dreams": "dream_tracker",
+    "nlu": "NLU_Analysis",
+    "know": "about_fibot",
+}
+
+_PROBE = (
+    "import time, importlib; t0 = time.perf_counter(); import streamlit; t1 = time.perf_counter(); "
+    "[importlib.import_module(m) for m in {mods!r}]; print(t1 - t0, time.perf_counter() - t1)"
+)
+
+def cold_import_seconds(modules):
+    """(streamlit seconds, seconds for `modules` on top of streamlit), in a new process."""
+    out = subprocess.run([sys.executable, "-c", _PROBE.format(mods=list(modules))], capture_output=True, text=True, check=True)
+    base, extra = out.stdout.strip().splitlines()[-1].split()
+    return float(base), float(extra)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--out", default="bench_routes.json")
+    args = parser.parse_args()
+
+    home = statistics.median(cold_import_seconds([])[0] for _ in range(args.repeats))
+    rows = [{"route": "home", "module": None, "import_ms": home * 1000}]
+    for route, module in ROUTE_MODULES.items():
+        try:
+            seconds = statistics.median(cold_import_seconds([module])[1] for _ in range(args.repeats))
+            rows.append({"route": route, "module": module, "import_ms": seconds * 1000})
+        except subprocess.CalledProcessError as e:
+            rows.append({"route": route, "module": module, "error": e.stderr.strip().splitlines()[-1]})
+    # What every page used to pay: all modules imported up front (shared deps counted once).
+    try:
+        eager = home + statistics.median(cold_import_seconds(ROUTE_MODULES.values())[1] for _ in range(args.repeats))
+    except subprocess.CalledProcessError:
+        eager = None
+
+    for r in rows:
+        print(f"{r['route']:>9}: " + (f"{r['import_ms']:.0f} ms" if "import_ms" in r else f"failed ({r['error']})"))
+    if eager is not None:
+        print(f"Home page imports: {eager * 1000:.0f} ms eager (before) -> {home * 1000:.0f} ms lazy (now)")
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({"timestamp": time.time(), "eager_home_ms": eager * 1000 if eager else None, "routes": rows}, f, indent=2)
+    print(f"Wrote {args.out}")
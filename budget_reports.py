@@ -0,0 +1,169 @@
+"""Budget health PDF reports, one at a time (the page) or in batches (monthly mail-out).
+
+    python budget_reports.py summaries.jsonl --out reports/ --workers 8
+    python budget_reports.py --synthetic 500 --out reports/      # throughput check
+
+Each input line is one report: {"account", "period", "health_score", "summary",
+"advice" (optional)}, with "summary" as produced by budget_summaries.summarize_budget.
+Output is cached by content hash, so unchanged reports are not rendered again.
+"""
+import hashlib, io, json, os, time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from textwrap import wrap
+
+import matplotlib
+matplotlib.use("Agg")  # Worker processes have no display
+import matplotlib.pyplot as plt
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+RENDERER_VERSION = "1"   # Bump when the layout changes, so cached PDFs are re-rendered
+INDEX_FILE = "index.json"
+
+# --- RENDERING ---
+def _bucket_chart(summary):
+    """Spent vs limit bar chart as PNG bytes."""
+    names = list(summary)
+    fig, ax = plt.subplots(figsize=(6, 2.6), dpi=110)
+    x = range(len(names))
+    ax.bar([i - 0.2 for i in x], [summary[n]["limit"] for n in names], width=0.4, label="Limit", color="#cccccc")
+    ax.bar([i + 0.2 for i in x], [summary[n]["spent"] for n in names], width=0.4, label="Spent",
+           color=["#2e7d32" if summary[n]["status"] == "ok" else "#c62828" for n in names])
+    ax.set_xticks(list(x))
+    ax.set_xticklabels([n.capitalize() for n in names])
+    ax.legend(frameon=False)
+    ax.spines[["top", "right"]].set_visible(False)
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    plt.close(fig)
+    return buf.getvalue()
+
+def render_report(report):
+    """One report dict -> PDF bytes."""
+    buf = io.BytesIO()
+    can = canvas.Canvas(buf, pagesize=letter)
+    w, h = letter
+
+    can.setFont("Helvetica-Bold", 18)
+    can.drawString(50, h - 50, "Fibot Pro: Cloud Financial Report")
+    can.setFont("Helvetica", 10)
+    subtitle = " | ".join(str(report[k]) for k in ("account", "period") if report.get(k))
+    if subtitle:
+        can.drawString(50, h - 66, subtitle)
+    can.setFont("Helvetica-Bold", 14)
+    can.drawString(50, h - 90, f"Health Score: {report['health_score']}/100")
+
+    curr_y = h - 125
+    for sec, val in report["summary"].items():
+        can.setFont("Helvetica-Bold", 11)
+        can.drawString(60, curr_y, f"{sec.capitalize()}: {val['status'].upper()}")
+        curr_y -= 15
+        can.setFont("Helvetica", 10)
+        can.drawString(70, curr_y, f"Spent: ₹{val['spent']} | Limit: ₹{val['limit']}")
+        curr_y -= 25
+
+    chart_h = 220
+    can.drawImage(ImageReader(io.BytesIO(_bucket_chart(report["summary"]))), 50, curr_y - chart_h,
+                  width=w - 100, height=chart_h, preserveAspectRatio=True)
+    curr_y -= chart_h + 25
+
+    if report.get("advice"):
+        can.setFont("Helvetica-Bold", 11)
+        can.drawString(50, curr_y, "Advice")
+        can.setFont("Helvetica", 10)
+        for line in wrap(report["advice"], 95):
+            curr_y -= 14
+            can.drawString(50, curr_y, line)
+
+    can.save()
+    return buf.getvalue()
+
+# --- BATCH ---
+def report_key(report):
+    """Content hash of everything that ends up in the PDF, plus the renderer version."""
+    payload = json.dumps(report, sort_keys=True, default=str) + RENDERER_VERSION
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+def _render_to_file(job):
+    # Runs in a worker: write the PDF there instead of shipping the bytes back.
+    report, path = job
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(render_report(report))
+    os.replace(tmp, path)
+    return path
+
+def render_batch(reports, out_dir, workers=None):
+    """Renders every report not already in `out_dir`; returns ({report key: entry}, stats).
+
+    Entries ({"account", "period", "path"}) are keyed by content hash, so several
+    reports for one account (e.g. different periods) each keep their own.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+
+    reports = list(reports)
+    paths, jobs = {}, {}
+    for report in reports:
+        key = report_key(report)
+        path = out_dir / f"{key}.pdf"
+        paths[key] = {"account": report.get("account"), "period": report.get("period"), "path": str(path)}
+        if not path.exists():
+            jobs[str(path)] = (report, str(path))  # Identical reports render once
+    jobs = list(jobs.values())
+
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Batches of jobs per task keep IPC overhead small for many tiny reports
+            list(pool.map(_render_to_file, jobs, chunksize=max(1, len(jobs) // (4 * (workers or os.cpu_count() or 1)))))
+
+    with open(out_dir / INDEX_FILE, "w", encoding="utf-8") as f:
+        json.dump(paths, f, indent=2)
+    seconds = time.perf_counter() - start
+    return paths, {
+        "reports": len(reports),
+        "rendered": len(jobs),
+        "cached": len(reports) - len(jobs),
+        "seconds": seconds,
+        "reports_per_sec": len(jobs) / seconds if jobs and seconds else 0.0,
+    }
+
+def synthetic_reports(count, seed=0):
+    import random
+    rng = random.Random(seed)
+    reports = []
+    for i in range(count):
+        summary = {}
+        for bucket, limit in (("needs", 25000), ("wants", 15000), ("savings", 5000), ("investments", 5000)):
+            spent = round(rng.uniform(0.3, 1.4) * limit, 2)
+            summary[bucket] = {"spent": spent, "limit": limit, "status": "exceeded" if spent > limit else "ok"}
+        score = max(0, 100 - 20 * sum(v["status"] == "exceeded" for v in summary.values()))
+        reports.append({"account": f"acct-{i:05d}", "period": "2025-01", "health_score": score, "summary": summary,
+                        "advice": "Move part of discretionary spend into a monthly SIP before it is spent."})
+    return reports
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", nargs="?", help="JSONL file, one report per line")
+    parser.add_argument("--synthetic", type=int, default=0, help="Render N generated reports instead")
+    parser.add_argument("--out", default="reports")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        reports = synthetic_reports(args.synthetic)
+    elif args.input:
+        with open(args.input, "r", encoding="utf-8") as f:
+            reports = [json.loads(line) for line in f if line.strip()]
+    else:
+        parser.error("give an input file or --synthetic N")
+
+    _, stats = render_batch(reports, args.out, args.workers)
+    print(f"{stats['reports']} reports: {stats['rendered']} rendered, {stats['cached']} cached, "
+          f"{stats['seconds']:.1f}s ({stats['reports_per_sec']:.1f} reports/sec)")
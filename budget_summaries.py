@@ -2,29 +2,100 @@ import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
 import google.generativeai as genai
-import io, re, json, os
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
-from textwrap import wrap
+import io, re, json, os, hashlib
+import numpy as np
+from datetime import date, timedelta
 from dotenv import load_dotenv
 from db_utils import get_db # Centralized MongoDB utility
+from budget_reports import render_report
+import rollups
+from cache_versions import versioned_cache
+import rate_limiter
+from rate_limiter import RateLimitBusy
+
+MONTHS_SHOWN = 12
+
+def category_totals_pipeline(start_date, end_date):
+    """Per-category spend between two "YYYY-MM-DD" dates (inclusive), summed inside MongoDB.
+
+    Transaction dates are stored as ISO strings, so a string range is a date range
+    and the date_category_amount index covers the whole pipeline.
+    """
+    return [
+        {"$match": {"date": {"$gte": start_date, "$lte": end_date}}},
+        {"$group": {"_id": "$category", "total": {"$sum": "$amount"}}},
+        {"$sort": {"total": -1}},
+    ]
 
 # --- CRITICAL: CACHED DATA FETCHING ---
-# This stops the infinite reload loop by keeping data in memory for 60 seconds.
-@st.cache_data(ttl=60)
-def fetch_cloud_data_for_analysis():
-    """Retrieves all transactions from the cloud and converts to a list for caching."""
-    try:
-        db = get_db()
-        # Convert cursor to list immediately; Streamlit cannot cache lazy cursors.
-        data = list(db.transactions.find())
-        return data
-    except Exception as e:
-        return []
+# Kept in memory until a write bumps the transactions version (stops the infinite reload loop).
+@versioned_cache("transactions")
+def fetch_category_totals(start_date, end_date):
+    """{category: amount} for the period; one small document per category comes back."""
+    db = get_db()
+    # Whole months come from the monthly rollups; partial months need the raw date range
+    if start_date.endswith("-01") and month_range(date.fromisoformat(end_date))[1] == end_date:
+        return rollups.category_totals(db, start_date[:7], end_date[:7])
+    return {row["_id"]: row["total"] for row in db.transactions.aggregate(category_totals_pipeline(start_date, end_date))}
+
+def month_range(month_start):
+    """("YYYY-MM-01", last day of that month) for a date in the month."""
+    next_month = (month_start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return month_start.strftime("%Y-%m-01"), (next_month - timedelta(days=1)).isoformat()
+
+def recent_months(count=MONTHS_SHOWN, today=None):
+    """First day of the current month and the `count - 1` months before it, newest first."""
+    month = (today or date.today()).replace(day=1)
+    months = []
+    for _ in range(count):
+        months.append(month)
+        month = (month - timedelta(days=1)).replace(day=1)
+    return months
+
+# --- LOCAL BUDGET EVALUATION ---
+# Which 50/30/10/10 bucket each Spending Insights category counts towards.
+CATEGORY_BUCKETS = {
+    "Food": "needs", "Bills": "needs", "Medical": "needs", "Education": "needs",
+    "Insurance": "needs", "Rent": "needs",
+    "Travel": "wants", "Entertainment": "wants", "Shopping": "wants", "Other": "wants", "Others": "wants",
+    "Savings": "savings",
+    "Investments": "investments", "Investment": "investments",
+}
+BUCKETS = ["needs", "wants", "savings", "investments"]
+ADVICE_MODEL = "gemini-3-flash" # Updated to current model
+
+def summarize_budget(category_totals, total_budget, allocation_percentages):
+    """{bucket: {"spent", "limit", "status"}} computed locally; unknown categories count as wants.
+
+    Same "ok"/"exceeded" statuses the advice prompt used to return: a bucket is
+    "exceeded" when its spend is above its limit.
+    """
+    totals = pd.Series(category_totals, dtype="float64")
+    buckets = totals.index.map(lambda c: CATEGORY_BUCKETS.get(c, "wants"))
+    spent = totals.groupby(buckets).sum().reindex(BUCKETS, fill_value=0.0)
+    limits = pd.Series(allocation_percentages, dtype="float64").reindex(BUCKETS, fill_value=0.0) * total_budget / 100
+    status = np.where(spent > limits, "exceeded", "ok")
+    return {
+        b: {"spent": round(float(spent[b]), 2), "limit": round(float(limits[b]), 2), "status": str(s)}
+        for b, s in zip(BUCKETS, status)
+    }
+
+def budget_digest(category_totals, total_budget, allocation_percentages):
+    """Stable key for one (totals, budget, allocation) combination."""
+    payload = json.dumps([sorted((c, round(v, 2)) for c, v in category_totals.items()),
+                          total_budget, allocation_percentages, ADVICE_MODEL], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+@st.cache_data(ttl=24 * 3600, max_entries=256, show_spinner=False)
+def fetch_budget_advice(digest, _prompt, _api_key):
+    """Gemini advice + anomalies, memoized on `digest` (the prompt is derived from it, so not hashed)."""
+    rate_limiter.acquire(_api_key, ADVICE_MODEL) # Shared quota across all sessions
+    response = genai.GenerativeModel(ADVICE_MODEL).generate_content(_prompt)
+    data = json.loads(re.search(r"\{[\s\S]*\}", response.text).group())
+    return {"advice": data.get("advice", ""), "anomalies": data.get("anomalies", [])}
 
 def calculate_health_score(summary_data, total_budget):
-    """Calculates a financial health score from 0-100 based on cloud analysis."""
+    """Calculates a financial health score from 0-100 based on the budget summary."""
     score = 100
     penalties = {
         "needs": 20,       
@@ -42,31 +113,39 @@ def main():
     st.set_page_config(page_title="💰 Fibot Pro | Budget", page_icon="💰", layout="wide")
     load_dotenv()
     
-    # --- Database Setup ---
-    db = get_db()
-    transactions_col = db.transactions
-
     # --- Gemini API ---
     api_key = os.getenv("GEMINI_API_KEY3")
     genai.configure(api_key=api_key)
-    model = genai.GenerativeModel("gemini-3-flash") # Updated to current model
-
-    # --- Load Spending Data from Cloud (Using Cached Function) ---
-    data_list = fetch_cloud_data_for_analysis()
-    history_df = pd.DataFrame(data_list)
-
-    if history_df.empty:
-        st.warning("No transactions found in the cloud. Please add entries in 'Spending Insights' first.")
-        st.stop()
-    
-    # Clean MongoDB internal fields for analysis
-    if '_id' in history_df.columns:
-        history_df = history_df.drop(columns=['_id'])
 
     # --- UI ---
     st.title("💰 Budget Summaries & Pro Health Score")
     st.markdown("Fibot Pro evaluates your cloud data to detect anomalies and track financial discipline.")
-    
+
+    # --- Budget Period (the budget is monthly, so only that month's spend is summed) ---
+    period = st.selectbox("Budget period", recent_months() + ["Custom range"],
+                          format_func=lambda m: m if isinstance(m, str) else m.strftime("%B %Y"))
+    if period == "Custom range":
+        picked = st.date_input("Date range", value=(date.today().replace(day=1), date.today()))
+        if len(picked) != 2:
+            st.info("Pick a start and an end date.")
+            st.stop()
+        start_date, end_date = picked[0].isoformat(), picked[1].isoformat()
+    else:
+        start_date, end_date = month_range(period)
+
+    # --- Load Category Totals from Cloud (Using Cached Function) ---
+    try:
+        category_totals = fetch_category_totals(start_date, end_date)
+    except Exception as e:
+        # A failed read is not cached, so the next rerun queries again
+        st.error(f"Could not load transactions from the cloud: {e}")
+        st.stop()
+
+    if not category_totals:
+        st.warning(f"No transactions found between {start_date} and {end_date}. "
+                   "Please add entries in 'Spending Insights' or pick another period.")
+        st.stop()
+
     # --- User Budget Inputs ---
     total_budget = st.number_input("Enter your total monthly budget (₹)", min_value=1000, value=50000, step=500)
 
@@ -78,59 +157,56 @@ def main():
 
     allocation_percentages = {"needs": n_p, "wants": w_p, "savings": s_p, "investments": i_p}
 
-    if "parsed_data" not in st.session_state: st.session_state.parsed_data = None
-    if "health_score" not in st.session_state: st.session_state.health_score = 0
-
-    # --- Generate Analysis ---
-    if st.button("📊 Analyze Cloud Financial Health", use_container_width=True):
+    if sum(allocation_percentages.values()) != 100:
+        st.caption(f"⚠️ Allocations add up to {sum(allocation_percentages.values())}%, not 100%.")
+
+    # --- Health Score (computed locally, so it follows every slider change instantly) ---
+    summary = summarize_budget(category_totals, total_budget, allocation_percentages)
+    h_score = calculate_health_score(summary, total_budget)
+    st.session_state.parsed_data = {"summary": summary}
+    st.session_state.health_score = h_score
+
+    st.divider()
+    c1, c2 = st.columns([1, 2])
+    with c1:
+        st.subheader("❤️ Health Score")
+        st.title(f"{h_score}/100")
+        if h_score >= 80: st.success("Status: Excellent! 🌟")
+        elif h_score >= 50: st.warning("Status: Monitor Spends. ⚠️")
+        else: st.error("Status: High Stress. 🚨")
+    with c2:
+        st.subheader("📊 Budget Buckets")
+        st.dataframe(pd.DataFrame(summary).T, use_container_width=True)
+
+    # --- AI Advice (only the free text needs the LLM; memoized per totals/budget/allocation) ---
+    digest = budget_digest(category_totals, total_budget, allocation_percentages)
+    if st.button("💡 Get Cloud Insights", use_container_width=True):
+        prompt = f"""
+        You are a senior financial advisor AI. Spending by category: {category_totals}
+        Budget: {total_budget} | Goals: {allocation_percentages}
+        Computed bucket summary (already final, do not recalculate): {summary}
+        Return ONLY valid JSON with structure:
+        {{
+          "anomalies": ["list of unusual cloud spending spikes"],
+          "advice": "Actionable budget optimization advice."
+        }}
+        """
         with st.spinner("Analyzing your cloud financial patterns..."):
-            # Group cloud data by category
-            category_totals = history_df.groupby("category")["amount"].sum().to_dict()
-
-            prompt = f"""
-            You are a senior financial advisor AI. Analyze cloud data: {category_totals}
-            Budget: {total_budget} | Goals: {allocation_percentages}
-            Return ONLY valid JSON with structure:
-            {{
-              "summary": {{
-                "needs": {{"spent": number, "limit": number, "status": "ok/exceeded"}},
-                "wants": {{"spent": number, "limit": number, "status": "ok/exceeded"}},
-                "savings": {{"spent": number, "limit": number, "status": "ok/exceeded"}},
-                "investments": {{"spent": number, "limit": number, "status": "ok/exceeded"}}
-              }},
-              "anomalies": ["list of unusual cloud spending spikes"],
-              "advice": "Actionable budget optimization advice."
-            }}
-            """
-
             try:
-                response = model.generate_content(prompt)
-                data_str = re.search(r"\{[\s\S]*\}", response.text).group()
-                parsed_data = json.loads(data_str)
-                st.session_state.parsed_data = parsed_data
-                
-                h_score = calculate_health_score(parsed_data["summary"], total_budget)
-                st.session_state.health_score = h_score
-
-                st.divider()
-                c1, c2 = st.columns([1, 2])
-                with c1:
-                    st.subheader("❤️ Health Score")
-                    st.title(f"{h_score}/100")
-                    if h_score >= 80: st.success("Status: Excellent! 🌟")
-                    elif h_score >= 50: st.warning("Status: Monitor Spends. ⚠️")
-                    else: st.error("Status: High Stress. 🚨")
-                
-                with c2:
-                    st.subheader("💡 Cloud Insights")
-                    st.info(parsed_data["advice"])
-
-                if parsed_data.get("anomalies"):
-                    st.subheader("🚩 Anomaly Alerts")
-                    for alert in parsed_data["anomalies"]: st.error(alert)
-
+                st.session_state.budget_advice = (digest, fetch_budget_advice(digest, prompt, api_key))
+            except RateLimitBusy:
+                st.warning(rate_limiter.BUSY_MESSAGE)
             except Exception as e:
                 st.error(f"Cloud Analysis Failed: {e}")
+
+    # Advice is shown only while it still matches the numbers on screen
+    advice_digest, advice = st.session_state.get("budget_advice") or (None, None)
+    if advice and advice_digest == digest:
+        st.subheader("💡 Cloud Insights")
+        st.info(advice["advice"])
+        if advice.get("anomalies"):
+            st.subheader("🚩 Anomaly Alerts")
+            for alert in advice["anomalies"]: st.error(alert)
             
     # --- PDF Generation ---
     if st.button("📄 Download Pro PDF Report"):
@@ -138,29 +214,11 @@ def main():
             st.error("⚠️ Run the cloud analysis first.")
         else:
             try:
-                pd_dat = st.session_state.parsed_data
-                hs = st.session_state.health_score
-                pdf_buffer = io.BytesIO()
-                can = canvas.Canvas(pdf_buffer, pagesize=letter)
-                w, h = letter
-
-                can.setFont("Helvetica-Bold", 18)
-                can.drawString(50, h - 50, "Fibot Pro: Cloud Financial Report")
-                can.setFont("Helvetica-Bold", 14)
-                can.drawString(50, h - 80, f"Health Score: {hs}/100")
-                
-                curr_y = h - 120
-                for sec, val in pd_dat["summary"].items():
-                    can.setFont("Helvetica-Bold", 11)
-                    can.drawString(60, curr_y, f"{sec.capitalize()}: {val['status'].upper()}")
-                    curr_y -= 15
-                    can.setFont("Helvetica", 10)
-                    can.drawString(70, curr_y, f"Spent: ₹{val['spent']} | Limit: ₹{val['limit']}")
-                    curr_y -= 25
-
-                can.save()
-                pdf_buffer.seek(0)
-                st.download_button("⬇️ Download PDF Report", pdf_buffer, "cloud_health_report.pdf", "application/pdf")
+                # Same renderer as the batch mail-out (budget_reports.py)
+                report = {"period": f"{start_date} to {end_date}", "health_score": st.session_state.health_score,
+                          "summary": st.session_state.parsed_data["summary"],
+                          "advice": advice["advice"] if advice and advice_digest == digest else None}
+                st.download_button("⬇️ Download PDF Report", render_report(report), "cloud_health_report.pdf", "application/pdf")
             except Exception as e:
                 st.error(f"PDF Generation Error: {e}")
 
@@ -0,0 +1,88 @@
+import functools, logging, threading
+import streamlit as st
+
+log = logging.getLogger(__name__)
+
+# --- PER-COLLECTION CACHE VERSIONS ---
+# Each reader is cached under the current version of the collections it reads.
+# A write bumps only its own collection, so e.g. adding a goal invalidates the
+# goal readers and leaves the transactions and history caches warm. Entries for
+# old versions are never read again and age out through max_entries / ttl.
+# Readers must let database errors propagate: st.cache_data does not cache an
+# exception, but it would keep an empty fallback value until the next write.
+SAFETY_TTL_S = 3600     # Backstop for writes made outside this app (other tools, Atlas UI)
+MAX_ENTRIES = 64
+
+_lock = threading.Lock()
+_versions = {}
+_stats = {}
+
+def version(collection):
+    with _lock:
+        return _versions.get(collection, 0)
+
+def bump(*collections):
+    """Call after writing to `collections`; their readers recompute on next use."""
+    with _lock:
+        for c in collections:
+            _versions[c] = _versions.get(c, 0) + 1
+
+def versioned_cache(*collections, ttl=SAFETY_TTL_S, max_entries=MAX_ENTRIES):
+    """st.cache_data keyed on the versions of `collections` as well as the arguments."""
+    def decorator(fn):
+        name = f"{fn.__module__}.{fn.__qualname__}"
+        counters = _stats.setdefault(name, {"collections": collections, "calls": 0, "misses": 0})
+
+        # No leading underscore: st.cache_data skips hashing "_"-prefixed parameters.
+        def compute(versions_key, *args, **kwargs):
+            counters["misses"] += 1
+            return fn(*args, **kwargs)
+
+        # st.cache_data tells functions apart by module + qualname, so give each wrapper the reader's own.
+        compute.__module__, compute.__qualname__, compute.__name__ = fn.__module__, fn.__qualname__, fn.__name__
+        cached = st.cache_data(ttl=ttl, max_entries=max_entries, show_spinner=False)(compute)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            counters["calls"] += 1
+            return cached(tuple(version(c) for c in collections), *args, **kwargs)
+
+        wrapper.clear = cached.clear
+        return wrapper
+    return decorator
+
+def stats():
+    """Hit rate per cached reader since the process started."""
+    rows = []
+    for name, s in _stats.items():
+        calls = s["calls"]
+        rows.append({
+            "function": name,
+            "collections": ", ".join(s["collections"]),
+            "calls": calls,
+            "misses": s["misses"],
+            "hit_rate": round(1 - s["misses"] / calls, 3) if calls else None,
+            "version": " / ".join(str(version(c)) for c in s["collections"]),
+        })
+    return rows
+
+# --- OPTIONAL: CHANGE STREAM SIGNAL ---
+def watch_changes(db, collections):
+    """Bumps versions on every change MongoDB reports for `collections`.
+
+    This also catches writes from other processes and tools. It needs a
+    replica set (Atlas always has one); elsewhere the thread logs once and
+    exits, and the in-process bumps plus the safety TTL still apply.
+    """
+    def run():
+        pipeline = [{"$match": {"ns.coll": {"$in": list(collections)}}}]
+        try:
+            with db.watch(pipeline) as stream:
+                for change in stream:
+                    bump(change["ns"]["coll"])
+        except Exception as e:
+            log.warning("Change stream unavailable, using in-process cache versions only: %s", e)
+
+    thread = threading.Thread(target=run, name="cache-version-watch", daemon=True)
+    thread.start()
+    return thread
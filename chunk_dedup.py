@@ -0,0 +1,94 @@
+import hashlib, zlib
+import numpy as np
+
+# --- MINHASH / LSH CONFIG ---
+NUM_PERM = 64
+BANDS = 8           # 8 bands x 8 rows: pairs above ~0.77 Jaccard collide with high probability
+THRESHOLD = 0.8     # Estimated Jaccard at which a colliding chunk counts as a near duplicate
+SHINGLE_WORDS = 3
+_PRIME = (1 << 31) - 1   # Signature values fit in uint32
+
+def _normalize(text):
+    return " ".join(text.lower().split())
+
+class ChunkDeduplicator:
+    """Drops exact and near-duplicate chunks before they are embedded.
+
+    Exact duplicates are caught by an 8-byte hash of the normalised text.
+    Near duplicates are caught by MinHash signatures over word shingles,
+    bucketed with LSH: a band collision only nominates a candidate, and the
+    chunk is dropped when the estimated Jaccard with it reaches `threshold`.
+    Per kept chunk only its signature (uint32 x num_perm) and one integer
+    hash per band are stored, never chunk texts.
+    """
+
+    def __init__(self, num_perm=NUM_PERM, bands=BANDS, shingle_words=SHINGLE_WORDS, threshold=THRESHOLD, seed=42):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)[:, None]
+        self.rows = num_perm // bands
+        self.bands = bands
+        self.shingle_words = shingle_words
+        self.threshold = threshold
+        # Odd 64-bit multipliers fold a band's rows into one integer; the band index salts it.
+        self._band_mix = rng.integers(1, 1 << 63, size=self.rows, dtype=np.uint64) | np.uint64(1)
+        self._band_salt = rng.integers(0, 1 << 63, size=bands, dtype=np.uint64)
+        self._exact = set()
+        self._buckets = {}   # band hash -> row in _sigs of the first kept chunk with it
+        self._sigs = np.empty((1024, num_perm), dtype=np.uint32)
+        self._kept = 0
+        self.seen = self.exact_dupes = self.near_dupes = 0
+
+    def _signature(self, words):
+        n = self.shingle_words
+        shingles = {zlib.crc32(" ".join(words[i:i + n]).encode("utf-8")) for i in range(len(words) - n + 1)}
+        x = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))[None, :] % _PRIME
+        return ((self._a * x + self._b) % _PRIME).min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, sig):
+        bands = sig.reshape(self.bands, self.rows).astype(np.uint64)
+        with np.errstate(over="ignore"):  # Wrap-around is the point of the mixing
+            return ((bands * self._band_mix).sum(axis=1) + self._band_salt).tolist()
+
+    def _remember(self, sig, keys):
+        if self._kept == len(self._sigs):
+            self._sigs = np.concatenate([self._sigs, np.empty_like(self._sigs)])
+        self._sigs[self._kept] = sig
+        for key in keys:
+            self._buckets.setdefault(key, self._kept)
+        self._kept += 1
+
+    def is_duplicate(self, text):
+        """Records `text` and returns True if it duplicates an earlier chunk."""
+        self.seen += 1
+        norm = _normalize(text)
+        digest = int.from_bytes(hashlib.blake2b(norm.encode("utf-8"), digest_size=8).digest(), "big")
+        if digest in self._exact:
+            self.exact_dupes += 1
+            return True
+        self._exact.add(digest)
+
+        words = norm.split()
+        if len(words) < self.shingle_words:
+            return False
+        sig = self._signature(words)
+        keys = self._band_keys(sig)
+        candidates = {self._buckets[key] for key in keys if key in self._buckets}
+        for row in candidates:
+            if np.mean(self._sigs[row] == sig) >= self.threshold:
+                self.near_dupes += 1
+                return True
+        self._remember(sig, keys)
+        return False
+
+    def stats(self):
+        dropped = self.exact_dupes + self.near_dupes
+        return {
+            "seen": self.seen,
+            "exact_dupes": self.exact_dupes,
+            "near_dupes": self.near_dupes,
+            "dropped": dropped,
+            "dropped_ratio": dropped / self.seen if self.seen else 0.0,
+        }
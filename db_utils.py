@@ -1,14 +1,120 @@
 import streamlit as st
 from pymongo import MongoClient
-import os
+from pymongo.errors import ConnectionFailure, PyMongoError
+import logging, os, threading
 import certifi
 from dotenv import load_dotenv
+from cache_versions import watch_changes
 
 load_dotenv()
 
+log = logging.getLogger(__name__)
+
+# Collections whose readers are cached with cache_versions.versioned_cache
+CACHED_COLLECTIONS = ("transactions", "user_goals", "search_history")
+
+# --- REQUIRED INDEXES ---
+# One entry per read path; `python db_utils.py` (or the background check started by
+# get_db) creates whatever is missing.
+# Extra keyword options (unique, partialFilterExpression, ...) go in "options".
+REQUIRED_INDEXES = {
+    "search_history": [
+        {"name": "timestamp_desc", "keys": [("timestamp", -1)]},                 # Sidebar: latest questions
+    ],
+    "transactions": [
+        # Budget month $match + $group (covered); also serves the newest-first date sort
+        {"name": "date_category_amount", "keys": [("date", 1), ("category", 1), ("amount", 1)]},
+        {"name": "category_amount", "keys": [("category", 1), ("amount", 1)]},   # Dream tracker savings $match + $sum
+        # Statement import dedup; manual entries have no hash, so the index is partial
+        {"name": "content_hash_unique", "keys": [("content_hash", 1)],
+         "options": {"unique": True, "partialFilterExpression": {"content_hash": {"$exists": True}}}},
+    ],
+    "monthly_rollups": [
+        {"name": "month_category", "keys": [("month", 1), ("category", 1)]},    # Budget month range / category totals
+    ],
+    "user_goals": [
+        {"name": "created_at_asc", "keys": [("created_at", 1)]},                 # Goals in creation order
+    ],
+}
+
+# Categories offered by Spending Insights (and targeted by statement import rules)
+CATEGORIES = ["Food", "Travel", "Entertainment", "Bills", "Shopping", "Medical", "Education", "Investments", "Insurance", "Savings", "Other"]
+
+# --- PROJECTIONS (only the fields the pages actually render) ---
+TRANSACTION_FIELDS = {"_id": 0, "date": 1, "category": 1, "amount": 1, "timestamp": 1}
+HISTORY_LIST_FIELDS = {"question": 1, "timestamp": 1}
+GOAL_FIELDS = {"name": 1, "target": 1, "created_at": 1}
+
+class IndexBuildError(Exception):
+    """One or more required indexes could not be created; `failures` maps "coll.name" to the error."""
+
+    def __init__(self, failures):
+        super().__init__("; ".join(f"{name}: {error}" for name, error in failures.items()))
+        self.failures = failures
+
+def ensure_indexes(db, required=REQUIRED_INDEXES):
+    """Creates missing indexes; existing ones with the same name and keys are left alone.
+
+    Returns {collection: [index names]} of what is now in place. Raises
+    IndexBuildError listing every index that could not be created (a conflict
+    with an existing index is reported, never dropped), and ConnectionFailure
+    straight away if the cluster is unreachable.
+    """
+    ensured, failures = {}, {}
+    for coll_name, specs in required.items():
+        coll = db[coll_name]
+        for spec in specs:
+            try:
+                coll.create_index(spec["keys"], name=spec["name"], **spec.get("options", {}))
+                ensured.setdefault(coll_name, []).append(spec["name"])
+            except ConnectionFailure:
+                raise  # Don't wait out a timeout for every index
+            except PyMongoError as e:
+                failures[f"{coll_name}.{spec['name']}"] = str(e)
+    if failures:
+        raise IndexBuildError(failures)
+    return ensured
+
+# --- ONE-SHOT BACKGROUND INDEX CHECK ---
+# get_db() must not block the first render on create_index, so the check runs in
+# a thread and its outcome is kept here for the startup report (main.py ?debug=1).
+_index_status = {"state": "not started", "detail": ""}
+
+def index_status():
+    return dict(_index_status)
+
+def start_index_check(db):
+    def run():
+        _index_status["state"] = "running"
+        try:
+            ensured = ensure_indexes(db)
+            _index_status.update(state="ok", detail=f"{sum(map(len, ensured.values()))} indexes in place")
+        except Exception as e:
+            _index_status.update(state="failed", detail=f"{type(e).__name__}: {e}")
+            log.error("Index check failed, run `python db_utils.py` once MongoDB is reachable: %s", e)
+
+    thread = threading.Thread(target=run, name="ensure-indexes", daemon=True)
+    thread.start()
+    return thread
+
 @st.cache_resource
 def get_db():
     """Cached connection to MongoDB Atlas."""
     ca = certifi.where()
     client = MongoClient(os.getenv("MONGO_URI"), tlsCAFile=ca)
-    return client.fibot_pro_db
\ No newline at end of file
+    db = client.fibot_pro_db
+    # Once per process, off the render path; set FIBOT_ENSURE_INDEXES=0 to leave it to the CLI
+    if os.getenv("FIBOT_ENSURE_INDEXES", "1") == "1":
+        start_index_check(db)
+    # Opt-in: also invalidate caches on writes made by other processes / tools
+    if os.getenv("FIBOT_CHANGE_STREAMS", "0") == "1":
+        watch_changes(db, CACHED_COLLECTIONS)
+    return db
+
+if __name__ == "__main__":
+    # python db_utils.py    -> create missing indexes; exits non-zero if any could not be created
+    try:
+        for coll_name, names in ensure_indexes(get_db()).items():
+            print(f"{coll_name}: {', '.join(names)}")
+    except (IndexBuildError, PyMongoError) as e:
+        raise SystemExit(f"Index check failed: {e}")
@@ -4,33 +4,24 @@ import os
 from datetime import datetime
 from pymongo import MongoClient
 from dotenv import load_dotenv
-from db_utils import get_db  # Import your central utility
+from db_utils import GOAL_FIELDS, get_db  # Import your central utility
+from cache_versions import bump, versioned_cache
+import rollups
 
 # --- CRITICAL: CACHED AGGREGATION ---
-# This function calculates total savings in the cloud and caches the result for 60 seconds.
-@st.cache_data(ttl=60)
+# This function calculates total savings in the cloud; cached until the transactions change.
+@versioned_cache("transactions")
 def get_cloud_savings_total():
-    try:
-        db = get_db()
-        pipeline = [
-            {"$match": {"category": {"$in": ["Savings", "Investments", "Investment"]}}},
-            {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
-        ]
-        aggregation_result = list(db.transactions.aggregate(pipeline))
-        return aggregation_result[0]['total'] if aggregation_result else 0
-    except Exception as e:
-        return 0
+    db = get_db()
+    # Sums the monthly rollups (months x 3 docs), not every savings transaction
+    return rollups.savings_total(db)
 
 # --- CRITICAL: CACHED GOALS LIST ---
-@st.cache_data(ttl=60)
+@versioned_cache("user_goals")
 def fetch_cloud_goals():
-    try:
-        db = get_db()
-        # MongoDB cursors must be converted to a list to be cached
-        return list(db.user_goals.find().sort("created_at", 1))
-    except Exception as e:
-        st.error(f"Error fetching goals: {e}")
-        return []
+    db = get_db()
+    # MongoDB cursors must be converted to a list to be cached
+    return list(db.user_goals.find({}, GOAL_FIELDS).sort("created_at", 1))
 
 def main():
     st.title("🎯 Dream Tracker Pro (Cloud)")
@@ -60,8 +51,8 @@ def main():
                     "target": g_target,
                     "created_at": datetime.now()
                 })
-                # Clear cache so new data shows immediately
-                st.cache_data.clear()
+                # Invalidate only the goal readers so the new dream shows immediately
+                bump("user_goals")
                 st.success(f"Dream '{g_name}' synced to cloud!")
                 st.rerun()
             else:
@@ -71,11 +62,19 @@ def main():
     st.divider()
     st.subheader("🚀 Your Financial Journey")
 
-    # Fetch live total from cached cloud aggregation
-    total_saved = get_cloud_savings_total()
+    # Fetch live total from cached cloud aggregation (errors are not cached, so a rerun retries)
+    try:
+        total_saved = get_cloud_savings_total()
+    except Exception as e:
+        st.warning(f"Could not load your savings total: {e}")
+        total_saved = 0
 
     # Retrieve Goals from cached cloud fetch
-    goals_list = fetch_cloud_goals()
+    try:
+        goals_list = fetch_cloud_goals()
+    except Exception as e:
+        st.error(f"Error fetching goals: {e}")
+        goals_list = []
     
     if not goals_list:
         st.info("You haven't set any cloud dreams yet. Add one above to get started!")
@@ -101,8 +100,8 @@ def main():
             # Delete Feature
             if st.button(f"Remove {name}", key=f"del_{goal['_id']}"):
                 goals_col.delete_one({"_id": goal["_id"]})
-                # Clear cache to reflect deletion
-                st.cache_data.clear()
+                # Invalidate the goal readers to reflect deletion
+                bump("user_goals")
                 st.rerun()
 
             # Celebrate Completion
@@ -0,0 +1,121 @@
+import os, threading
+from collections import OrderedDict
+from pathlib import Path
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EMBED_BACKEND = os.getenv("FIBOT_EMBED_BACKEND", "hf")  # "hf" (PyTorch) or "onnx"
+ONNX_DIR = "minilm_onnx"
+QUERY_CACHE_SIZE = 4096
+MAX_LENGTH = 256  # all-MiniLM-L6-v2 max_seq_length
+
+def normalize_query(text):
+    """Cache key: MiniLM is uncased, so case and whitespace never change the embedding."""
+    return " ".join(text.split()).lower()
+
+# --- ONNX BACKEND ---
+def export_minilm_onnx(model_name=EMBED_MODEL, out_dir=ONNX_DIR):
+    """One-time export of the MiniLM encoder (token embeddings only; pooling runs in numpy)."""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    dummy = tokenizer(["export me"], return_tensors="pt")
+    axes = {0: "batch", 1: "tokens"}
+    torch.onnx.export(
+        model,
+        (dummy["input_ids"], dummy["attention_mask"], dummy["token_type_ids"]),
+        str(out_dir / "model.onnx"),
+        input_names=["input_ids", "attention_mask", "token_type_ids"],
+        output_names=["last_hidden_state"],
+        dynamic_axes={"input_ids": axes, "attention_mask": axes, "token_type_ids": axes, "last_hidden_state": axes},
+        opset_version=17
+    )
+    tokenizer.save_pretrained(out_dir)
+    return out_dir / "model.onnx"
+
+class OnnxMiniLMEmbeddings(Embeddings):
+    """MiniLM on onnxruntime: mean pooling + L2 normalisation, like the sentence-transformers model."""
+
+    def __init__(self, model_name=EMBED_MODEL, onnx_dir=ONNX_DIR, batch_size=64):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+        onnx_dir = Path(onnx_dir)
+        optimized = onnx_dir / "model.opt.onnx"
+        if not optimized.exists() and not (onnx_dir / "model.onnx").exists():
+            export_minilm_onnx(model_name, onnx_dir)
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if not optimized.exists():
+            # First load writes the fused graph so later processes skip optimisation.
+            opts.optimized_model_filepath = str(optimized)
+            source = onnx_dir / "model.onnx"
+        else:
+            source = optimized
+        self.session = ort.InferenceSession(str(source), opts, providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(onnx_dir)
+        self.model_name = model_name
+        self.batch_size = batch_size
+
+    def _encode(self, texts):
+        enc = self.tokenizer(texts, padding=True, truncation=True, max_length=MAX_LENGTH, return_tensors="np")
+        feeds = {k: v.astype("int64") for k, v in enc.items() if k in self._inputs}
+        hidden = self.session.run(None, feeds)[0]
+        mask = enc["attention_mask"][..., None].astype("float32")
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def embed_documents(self, texts):
+        out = []
+        for i in range(0, len(texts), self.batch_size):
+            out.extend(self._encode(list(texts[i:i + self.batch_size])).tolist())
+        return out
+
+    def embed_query(self, text):
+        return self._encode([text])[0].tolist()
+
+# --- QUERY CACHE ---
+class CachedQueryEmbeddings(Embeddings):
+    """Bounded LRU in front of embed_query; bulk embed_documents passes straight through."""
+
+    def __init__(self, base, max_entries=QUERY_CACHE_SIZE):
+        self.base = base
+        self.model_name = getattr(base, "model_name", EMBED_MODEL)
+        self.max_entries = max_entries
+        self.hits = self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        return self.base.embed_documents(texts)
+
+    def embed_query(self, text):
+        key = normalize_query(text)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+        vector = self.base.embed_query(key)
+        with self._lock:
+            self._cache[key] = vector
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return vector
+
+def get_embeddings(backend=EMBED_BACKEND, model_name=EMBED_MODEL, cache_size=QUERY_CACHE_SIZE):
+    """Embeddings used for both index build and query time, so vectors stay comparable."""
+    if backend == "onnx":
+        base = OnnxMiniLMEmbeddings(model_name)
+    elif backend == "hf":
+        from langchain_huggingface import HuggingFaceEmbeddings
+        base = HuggingFaceEmbeddings(model_name=model_name)
+    else:
+        raise ValueError(f"Unknown embedding backend: {backend}")
+    return CachedQueryEmbeddings(base, cache_size)
@@ -0,0 +1,236 @@
+import copy, json, os, queue, threading
+from pathlib import Path
+import torch
+from transformers import AutoConfig, AutoModelForCausalLM, AutoTokenizer, StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+
+GRANITE_MODEL = "ibm-granite/granite-3.3-2b-instruct"
+MAX_NEW_TOKENS = 256
+# CPU precision: "fp32" (baseline), "bf16", or "int8" (dynamic quantization of Linear layers).
+PRECISION = os.getenv("FIBOT_GRANITE_PRECISION", "fp32")
+QUANTIZED_DIR = "granite_quantized"
+INT8_WEIGHTS = "int8_state_dict.pt"
+USE_PREFIX_CACHE = os.getenv("FIBOT_PREFIX_CACHE", "1") == "1"
+STREAM_TIMEOUT_S = float(os.getenv("FIBOT_STREAM_TIMEOUT_S", "120"))  # Longest wait for the next streamed piece
+# Assisted (speculative) decoding: a small draft model proposes tokens, Granite-2B verifies them.
+USE_ASSISTED = os.getenv("FIBOT_ASSISTED", "0") == "1"
+DRAFT_MODEL = os.getenv("FIBOT_DRAFT_MODEL", "ibm-granite/granite-3.1-1b-a400m-instruct")
+
+# Static start of every chatbot prompt; its KV cache is computed once per model.
+PROMPT_PREFIX = (
+    "You are a financial assistant. "
+    "Use ONLY the context below to answer the question.\n\n"
+    "Context:\n"
+)
+
+# Fixed question set shared by the Granite benchmarks.
+FINANCE_QUESTIONS = [
+    "How do I start a SIP?",
+    "What is the difference between a mutual fund and an ETF?",
+    "How much should I keep in an emergency fund?",
+    "What is compound interest?",
+    "Should I pay off debt or invest first?",
+    "What is a good credit score and how do I improve it?",
+    "How does inflation affect my savings?",
+    "What is the 50/30/20 budgeting rule?",
+]
+
+def load_granite(model_name=GRANITE_MODEL, precision=PRECISION):
+    """Loads (model, tokenizer): fp16 on GPU when available, `precision` on CPU otherwise."""
+    if torch.cuda.is_available():
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForCausalLM.from_pretrained(
+            model_name,
+            torch_dtype=torch.float16,
+            device_map=None
+        )
+        model = model.to("cuda")
+        return model, tokenizer
+    if precision == "fp32":
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForCausalLM.from_pretrained(
+            model_name,
+            torch_dtype=torch.float32,
+            device_map={"": "cpu"}
+        )
+        return model, tokenizer
+    if precision not in ("bf16", "int8"):
+        raise ValueError(f"Unknown Granite precision: {precision}")
+
+    saved_dir = Path(QUANTIZED_DIR) / model_name.replace("/", "--") / precision
+    if (saved_dir / "fibot_precision.json").exists():
+        return load_quantized(saved_dir)
+    model, tokenizer = quantize_granite(model_name, precision)
+    save_quantized(model, tokenizer, saved_dir, precision, model_name)
+    return model, tokenizer
+
+# --- LOW-PRECISION CPU MODES ---
+def _quantize_int8(model):
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def _int8_skeleton(config):
+    """The module tree _quantize_int8 produces, without ever allocating the fp32 weights.
+
+    Parameters start on the meta device (buffers such as rotary tables stay
+    real), and every nn.Linear becomes an empty dynamic-int8 Linear, exactly
+    the modules quantize_dynamic swaps in.
+    """
+    from accelerate import init_empty_weights
+    from torch.ao.nn.quantized.dynamic import Linear as DynamicInt8Linear
+    with init_empty_weights():
+        model = AutoModelForCausalLM.from_config(config, torch_dtype=torch.float32)
+    for name, module in list(model.named_modules()):
+        if type(module) is torch.nn.Linear:
+            parent_name, _, child = name.rpartition(".")
+            parent = model.get_submodule(parent_name) if parent_name else model
+            setattr(parent, child, DynamicInt8Linear(module.in_features, module.out_features,
+                                                     bias_=module.bias is not None, dtype=torch.qint8))
+    return model
+
+def quantize_granite(model_name, precision):
+    """Builds a bf16 or dynamic-int8 CPU model from the original fp32 checkpoint."""
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    dtype = torch.bfloat16 if precision == "bf16" else torch.float32
+    model = AutoModelForCausalLM.from_pretrained(model_name, torch_dtype=dtype, device_map={"": "cpu"})
+    if precision == "int8":
+        model = _quantize_int8(model)
+    model.eval()
+    return model, tokenizer
+
+def save_quantized(model, tokenizer, out_dir, precision, model_name=GRANITE_MODEL):
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tokenizer.save_pretrained(out_dir)
+    if precision == "int8":
+        # Packed int8 params are not safetensors-serializable; keep the config + a state dict.
+        model.config.save_pretrained(out_dir)
+        torch.save(model.state_dict(), out_dir / INT8_WEIGHTS)
+    else:
+        model.save_pretrained(out_dir)
+    # Written last: its presence marks a complete save.
+    with open(out_dir / "fibot_precision.json", "w", encoding="utf-8") as f:
+        json.dump({"precision": precision, "source_model": model_name}, f)
+
+def load_quantized(saved_dir):
+    saved_dir = Path(saved_dir)
+    with open(saved_dir / "fibot_precision.json", "r", encoding="utf-8") as f:
+        precision = json.load(f)["precision"]
+    tokenizer = AutoTokenizer.from_pretrained(saved_dir)
+    if precision == "int8":
+        # Rebuild the quantized module tree without fp32 weights, then fill it from the saved tensors.
+        model = _int8_skeleton(AutoConfig.from_pretrained(saved_dir))
+        state = torch.load(saved_dir / INT8_WEIGHTS, weights_only=True, mmap=True)
+        model.load_state_dict(state, assign=True)  # assign: meta parameters take the loaded tensors
+    else:
+        model = AutoModelForCausalLM.from_pretrained(saved_dir, torch_dtype=torch.bfloat16, device_map={"": "cpu"})
+    model.eval()
+    return model, tokenizer
+
+def load_draft_model(model, tokenizer, draft_name=DRAFT_MODEL):
+    """Loads the assistant model on the same device/dtype as `model`; it must share the tokenizer."""
+    draft_tokenizer = AutoTokenizer.from_pretrained(draft_name)
+    if draft_tokenizer.get_vocab() != tokenizer.get_vocab():
+        raise ValueError(f"Draft model {draft_name} does not share the Granite tokenizer")
+    draft = AutoModelForCausalLM.from_pretrained(draft_name, torch_dtype=model.dtype)
+    return draft.to(model.device).eval()
+
+def build_prompt(context, question):
+    return f"{PROMPT_PREFIX}{context}\n\nQuestion: {question}\nAnswer:"
+
+class _StopOnEvent(StoppingCriteria):
+    """Lets the consumer abort a background generate() when it stops reading."""
+
+    def __init__(self, event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return self.event.is_set()
+
+# --- GENERATION ---
+class PromptPrefixCache:
+    """Key/value cache for PROMPT_PREFIX, so each request only prefills context + question."""
+
+    def __init__(self, model, tokenizer, prefix=PROMPT_PREFIX):
+        self.prefix = prefix
+        self.prefix_ids = tokenizer(prefix, return_tensors="pt").input_ids.to(model.device)
+        with torch.no_grad():
+            self.past_key_values = model(self.prefix_ids, use_cache=True).past_key_values
+
+    def split_input_ids(self, tokenizer, prompt):
+        """Prefix tokens pinned to the cached ones, followed by the tokenized remainder."""
+        suffix = tokenizer(prompt[len(self.prefix):], add_special_tokens=False, return_tensors="pt").input_ids
+        return torch.cat([self.prefix_ids, suffix.to(self.prefix_ids.device)], dim=1)
+
+class GraniteGenerator:
+    """Greedy Granite generation for the chatbot, blocking or streamed.
+
+    With an `assistant_model`, generation is assisted: greedy output is
+    unchanged, only faster when the draft's proposals are accepted. The
+    prefix KV cache is not combined with it, since the draft would still
+    need its own prefill of the full prompt.
+    """
+
+    def __init__(self, model, tokenizer, use_prefix_cache=USE_PREFIX_CACHE, assistant_model=None):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.assistant_model = assistant_model
+        use_prefix_cache = use_prefix_cache and assistant_model is None
+        self.prefix_cache = PromptPrefixCache(model, tokenizer) if use_prefix_cache else None
+
+    def _inputs(self, prompt):
+        extra = {"assistant_model": self.assistant_model} if self.assistant_model is not None else {}
+        cache = self.prefix_cache
+        if cache is None or not prompt.startswith(cache.prefix):
+            return dict(self.tokenizer(prompt, return_tensors="pt").to(self.model.device), **extra)
+        input_ids = cache.split_input_ids(self.tokenizer, prompt)
+        # generate() extends the cache in place, so every request gets its own copy.
+        return {
+            "input_ids": input_ids,
+            "attention_mask": torch.ones_like(input_ids),
+            "past_key_values": copy.deepcopy(cache.past_key_values),
+        }
+
+    def generate(self, prompt, max_new_tokens=MAX_NEW_TOKENS):
+        inputs = self._inputs(prompt)
+        with torch.no_grad():
+            out = self.model.generate(**inputs, max_new_tokens=max_new_tokens, do_sample=False)
+        new_tokens = out[0, inputs["input_ids"].shape[1]:]
+        return self.tokenizer.decode(new_tokens, skip_special_tokens=True).strip()
+
+    def stream(self, prompt, max_new_tokens=MAX_NEW_TOKENS):
+        """Yields decoded text pieces while generate() runs on a background thread.
+
+        An exception in generate() is re-raised here; a stall longer than
+        STREAM_TIMEOUT_S raises TimeoutError instead of blocking the page.
+        """
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True,
+                                        timeout=STREAM_TIMEOUT_S)
+        stop = threading.Event()
+        kwargs = dict(
+            **self._inputs(prompt),
+            streamer=streamer,
+            max_new_tokens=max_new_tokens,
+            do_sample=False,
+            stopping_criteria=StoppingCriteriaList([_StopOnEvent(stop)])
+        )
+        errors = []
+
+        def run():
+            try:
+                self.model.generate(**kwargs)
+            except Exception as e:
+                # generate() only ends the streamer on success; end it here so the reader wakes up.
+                errors.append(e)
+                streamer.end()
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        try:
+            yield from streamer
+        except queue.Empty:
+            raise TimeoutError(f"No tokens from Granite for {STREAM_TIMEOUT_S:.0f}s") from None
+        finally:
+            # Runs on normal completion, on errors and when Streamlit abandons the generator mid-answer.
+            stop.set()
+            thread.join(STREAM_TIMEOUT_S)
+        if errors:
+            raise errors[0]
@@ -0,0 +1,196 @@
+import itertools, os, queue, threading, time
+import multiprocessing as mp
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from granite_llm import GRANITE_MODEL, MAX_NEW_TOKENS
+
+# --- BATCHING CONFIG ---
+MAX_BATCH = 8          # Largest padded batch handed to one generate() call
+BATCH_WINDOW_MS = 25   # How long the worker waits for more requests after the first
+GENERATE_TIMEOUT_S = float(os.getenv("FIBOT_WORKER_TIMEOUT_S", "300"))  # Longest a session waits for one answer
+HEALTH_CHECK_S = 1.0   # How often an idle dispatcher checks that the worker process is still alive
+
+class WorkerDied(RuntimeError):
+    """The worker process exited, so its pending requests will never be answered."""
+
+# --- WORKER PROCESS ---
+def _generate_batch(model, tokenizer, prompts, limits):
+    import torch
+    enc = tokenizer(prompts, return_tensors="pt", padding=True).to(model.device)
+    with torch.no_grad():
+        out = model.generate(
+            **enc,
+            max_new_tokens=max(limits),
+            do_sample=False,
+            pad_token_id=tokenizer.pad_token_id
+        )
+    new_tokens = out[:, enc["input_ids"].shape[1]:]
+    # Greedy decoding: each row's first n tokens are what a solo call with max_new_tokens=n gives.
+    return [tokenizer.decode(toks[:n], skip_special_tokens=True).strip() for toks, n in zip(new_tokens, limits)]
+
+def _collect_batch(requests, first, max_batch, window):
+    """Gathers requests arriving within `window` seconds of the first one."""
+    batch, stop = [first], False
+    deadline = time.monotonic() + window
+    while len(batch) < max_batch:
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            break
+        try:
+            req = requests.get(timeout=timeout)
+        except queue.Empty:
+            break
+        if req is None:
+            stop = True
+            break
+        batch.append(req)
+    return batch, stop
+
+def _worker_loop(requests, results, model_name, max_batch, window):
+    from granite_llm import load_granite
+    model, tokenizer = load_granite(model_name)
+    # Decoder-only models must be left-padded so every row continues from its own last token.
+    tokenizer.padding_side = "left"
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+
+    stop = False
+    while not stop:
+        first = requests.get()
+        if first is None:
+            break
+        batch, stop = _collect_batch(requests, first, max_batch, window)
+        ids = [r[0] for r in batch]
+        try:
+            texts = _generate_batch(model, tokenizer, [r[1] for r in batch], [r[2] for r in batch])
+            for req_id, text in zip(ids, texts):
+                results.put((req_id, text, None, len(batch)))
+        except Exception as e:
+            for req_id in ids:
+                results.put((req_id, None, f"{type(e).__name__}: {e}", len(batch)))
+    results.put(None)
+
+# --- CLIENT (lives in the Streamlit process) ---
+class GraniteWorker:
+    """Owns a separate process running Granite; sessions submit prompts and get Futures.
+
+    Requests that arrive within BATCH_WINDOW_MS of each other are padded into one
+    batched generate() call, so concurrent users share model passes instead of
+    queueing behind each other on their script threads.
+    """
+
+    def __init__(self, model_name=GRANITE_MODEL, max_batch=MAX_BATCH, window_ms=BATCH_WINDOW_MS):
+        ctx = mp.get_context("spawn")
+        self._requests = ctx.Queue()
+        self._results = ctx.Queue()
+        self._process = ctx.Process(
+            target=_worker_loop,
+            args=(self._requests, self._results, model_name, max_batch, window_ms / 1000),
+            daemon=True
+        )
+        self._process.start()
+
+        self._ids = itertools.count()
+        self._pending = {}
+        self._dead = None  # Reason the worker stopped; new requests fail fast once set
+        self._lock = threading.Lock()
+        self.requests_done = 0
+        self.batch_slots = 0  # Sum of batch sizes seen per request, for the average
+        self._listener = threading.Thread(target=self._dispatch, daemon=True)
+        self._listener.start()
+
+    def submit(self, prompt, max_new_tokens=MAX_NEW_TOKENS):
+        future = Future()
+        with self._lock:
+            if self._dead:
+                raise WorkerDied(self._dead)
+            req_id = next(self._ids)
+            self._pending[req_id] = future
+        future.request_id = req_id
+        self._requests.put((req_id, prompt, max_new_tokens))
+        return future
+
+    def generate(self, prompt, max_new_tokens=MAX_NEW_TOKENS, timeout=GENERATE_TIMEOUT_S):
+        future = self.submit(prompt, max_new_tokens)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            # Nobody waits for this answer any more; the dispatcher drops it when it arrives.
+            with self._lock:
+                self._pending.pop(future.request_id, None)
+            future.cancel()
+            raise
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests_done,
+                "pending": len(self._pending),
+                "avg_batch": self.batch_slots / self.requests_done if self.requests_done else 0.0,
+            }
+
+    def close(self, timeout=10):
+        self._requests.put(None)
+        self._process.join(timeout)
+
+    def _fail_pending(self, reason):
+        with self._lock:
+            self._dead = reason
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for future in pending:
+            future.set_exception(WorkerDied(reason))
+
+    def _dispatch(self):
+        while True:
+            try:
+                msg = self._results.get(timeout=HEALTH_CHECK_S)
+            except queue.Empty:
+                # Results already queued are drained first, so only an idle queue means a dead worker.
+                if self._process.is_alive():
+                    continue
+                self._fail_pending(f"Granite worker exited with code {self._process.exitcode}")
+                break
+            if msg is None:
+                self._fail_pending("Granite worker was shut down")
+                break
+            req_id, text, error, batch_size = msg
+            with self._lock:
+                future = self._pending.pop(req_id, None)
+                self.requests_done += 1
+                self.batch_slots += batch_size
+            if future is None:
+                continue
+            if error:
+                future.set_exception(RuntimeError(error))
+            else:
+                future.set_result(text)
+
+if __name__ == "__main__":
+    import argparse
+    from concurrent.futures import ThreadPoolExecutor
+    from granite_llm import FINANCE_QUESTIONS, build_prompt
+
+    parser = argparse.ArgumentParser(description="Measure worker throughput under concurrent chat users.")
+    parser.add_argument("--users", type=int, default=12)
+    parser.add_argument("--requests-per-user", type=int, default=2)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--window-ms", type=int, default=BATCH_WINDOW_MS)
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    args = parser.parse_args()
+
+    worker = GraniteWorker(max_batch=args.max_batch, window_ms=args.window_ms)
+    worker.generate(build_prompt("", "warm up"), max_new_tokens=1, timeout=None)  # Model load is not part of the measurement
+
+    def user_session(user):
+        for i in range(args.requests_per_user):
+            q = FINANCE_QUESTIONS[(user + i) % len(FINANCE_QUESTIONS)]
+            worker.generate(build_prompt("No relevant context found.", q), max_new_tokens=args.max_new_tokens)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        list(pool.map(user_session, range(args.users)))
+    elapsed = time.perf_counter() - start
+    total = args.users * args.requests_per_user
+    print(f"{total} requests in {elapsed:.1f}s -> {total / elapsed:.2f} req/s "
+          f"(max_batch={args.max_batch}, avg batch={worker.stats()['avg_batch']:.2f})")
+    worker.close()
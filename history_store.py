@@ -0,0 +1,98 @@
+import csv, os, re, sqlite3, threading, time
+
+DB_FILE = "search_history.db"
+LEGACY_CSV = "search_history.csv"
+
+class HistoryStore:
+    """Append-only chat history in SQLite, with an FTS5 index for search.
+
+    Appends are a single INSERT and every read is bounded by a LIMIT, so the
+    cost of a question no longer grows with the size of the history.
+    """
+
+    def __init__(self, path=DB_FILE, legacy_csv=LEGACY_CSV):
+        # Streamlit sessions run on different threads; one connection behind a lock.
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS history ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "question TEXT NOT NULL, answer TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self.has_fts = self._create_fts()
+        self._migrate_csv(legacy_csv)
+
+    def _create_fts(self):
+        try:
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS history_fts "
+                "USING fts5(question, answer, content='history', content_rowid='id')"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS history_ai AFTER INSERT ON history BEGIN "
+                "INSERT INTO history_fts(rowid, question, answer) VALUES (new.id, new.question, new.answer); END"
+            )
+            return True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: search falls back to LIKE.
+            return False
+
+    def _migrate_csv(self, legacy_csv):
+        """One-time import of the old full-rewrite CSV, which is then renamed aside."""
+        if not legacy_csv or not os.path.exists(legacy_csv):
+            return
+        with open(legacy_csv, "r", encoding="utf-8") as f:
+            rows = [(row[0], row[1]) for row in csv.reader(f) if len(row) >= 2]
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO history (question, answer, created_at) VALUES (?, ?, ?)",
+                [(q, a, now) for q, a in rows]
+            )
+        os.replace(legacy_csv, f"{legacy_csv}.migrated")
+
+    # --- Writes ---
+    def append(self, question, answer):
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "INSERT INTO history (question, answer, created_at) VALUES (?, ?, ?)",
+                (question, answer, time.time())
+            )
+            return cur.lastrowid
+
+    # --- Reads (all bounded) ---
+    def recent(self, limit=20):
+        """Newest-first (id, question) pairs; answers are fetched on demand via get()."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, question FROM history ORDER BY id DESC LIMIT ?", (limit,)
+            ).fetchall()
+
+    def last_question(self):
+        rows = self.recent(1)
+        return rows[0][1] if rows else None
+
+    def get(self, entry_id):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT question, answer FROM history WHERE id = ?", (entry_id,)
+            ).fetchone()
+
+    def search(self, text, limit=20):
+        """Prefix full-text search over questions and answers, best matches first."""
+        terms = re.findall(r"\w+", text)
+        if not terms:
+            return self.recent(limit)
+        with self._lock:
+            if self.has_fts:
+                match = " ".join(f'"{t}"*' for t in terms)
+                return self._conn.execute(
+                    "SELECT h.id, h.question FROM history_fts f JOIN history h ON h.id = f.rowid "
+                    "WHERE history_fts MATCH ? ORDER BY f.rank LIMIT ?", (match, limit)
+                ).fetchall()
+            return self._conn.execute(
+                "SELECT id, question FROM history WHERE question LIKE ? ORDER BY id DESC LIMIT ?",
+                (f"%{text.strip()}%", limit)
+            ).fetchall()
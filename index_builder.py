@@ -0,0 +1,213 @@
+import json, os, shutil, time
+from itertools import islice
+from pathlib import Path
+import numpy as np
+from chunk_dedup import ChunkDeduplicator
+
+# --- BUILD CONFIG ---
+HF_DATASETS = [
+    "SALT-NLP/FLUE-FiQA",
+    "sujet-ai/Sujet-Finance-Instruct-177k",
+    "bilalRahib/fiqa-personal-finance-dataset"
+]
+EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+BATCH_SIZE = 2048  # Chunks embedded and written per shard; bounds peak memory.
+MANIFEST = "manifest.json"
+
+# --- STREAMING SOURCES ---
+def _row_formatter(cols):
+    """Picks the text field of a dataset row, mirroring the original column rules."""
+    if "text" in cols:
+        return lambda row: row["text"]
+    if "sentence" in cols:
+        return lambda row: row["sentence"]
+    if "question" in cols and "answer" in cols:
+        return lambda row: f"Q: {row['question']}\nA: {row['answer']}"
+    return lambda row: row[cols[0]]
+
+def iter_dataset_texts(ds_names=HF_DATASETS):
+    """Yields texts one row at a time without materialising any dataset."""
+    from datasets import load_dataset
+    for ds_name in ds_names:
+        stream = load_dataset(ds_name, split="train", streaming=True)
+        to_text = None
+        for row in stream:
+            if to_text is None:
+                to_text = _row_formatter(list(row.keys()))
+            yield str(to_text(row))
+
+def iter_chunks(texts, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    for txt in texts:
+        yield from splitter.split_text(txt)
+
+def iter_batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+# --- CHECKPOINT MANIFEST ---
+def load_manifest(work_dir):
+    path = Path(work_dir) / MANIFEST
+    if path.exists():
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"chunks_done": 0, "shards": [], "complete": False}
+
+def save_manifest(work_dir, manifest):
+    """Atomic write: the manifest is the commit point for every finished shard."""
+    path = Path(work_dir) / MANIFEST
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+def _write_shard(work_dir, shard_id, texts, vectors):
+    name = f"shard_{shard_id:05d}"
+    np.save(Path(work_dir) / f"{name}.npy", vectors)
+    with open(Path(work_dir) / f"{name}.jsonl", "w", encoding="utf-8") as f:
+        for txt in texts:
+            f.write(json.dumps(txt) + "\n")
+    return name
+
+def iter_shards(work_dir):
+    """Yields (texts, vectors) one finished shard at a time."""
+    for shard in load_manifest(work_dir)["shards"]:
+        vectors = np.load(Path(work_dir) / f"{shard['name']}.npy")
+        with open(Path(work_dir) / f"{shard['name']}.jsonl", "r", encoding="utf-8") as f:
+            texts = [json.loads(line) for line in f]
+        yield texts, vectors
+
+# --- BUILD PIPELINE ---
+def _index_chunks(chunks, skip, dedup):
+    """Yields (raw_position, chunk) for chunks that still need embedding."""
+    for pos, chunk in enumerate(chunks):
+        # Skipped chunks still pass through dedup so its state matches the interrupted run.
+        if dedup is not None and dedup.is_duplicate(chunk):
+            continue
+        if pos >= skip:
+            yield pos, chunk
+
+def build_shards(work_dir, embeddings, chunks, batch_size=BATCH_SIZE, log=print, dedup=None):
+    """Embeds `chunks` in bounded batches, resuming after the last finished shard.
+
+    `chunks_done` counts raw chunks consumed (before dedup), so a resumed run
+    lines up with the same position in the stream.
+    """
+    Path(work_dir).mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest(work_dir)
+    if manifest["chunks_done"]:
+        log(f"Resuming after {manifest['chunks_done']} chunks ({len(manifest['shards'])} shards)")
+    counter = {"consumed": 0}
+
+    def counted(items):
+        for item in items:
+            counter["consumed"] += 1
+            yield item
+
+    # Already-embedded chunks are only re-split, never re-embedded.
+    pending = _index_chunks(counted(chunks), manifest["chunks_done"], dedup)
+    start, embedded = time.perf_counter(), 0
+    for batch in iter_batches(pending, batch_size):
+        texts = [chunk for _, chunk in batch]
+        vectors = np.asarray(embeddings.embed_documents(texts), dtype="float32")
+        name = _write_shard(work_dir, len(manifest["shards"]), texts, vectors)
+        manifest["shards"].append({"name": name, "count": len(texts)})
+        manifest["chunks_done"] = batch[-1][0] + 1
+        save_manifest(work_dir, manifest)
+
+        embedded += len(texts)
+        rate = embedded / max(time.perf_counter() - start, 1e-9)
+        log(f"{name}: {manifest['chunks_done']} chunks read, {rate:.1f} chunks/s embedded")
+
+    elapsed = time.perf_counter() - start
+    manifest["chunks_done"] = max(manifest["chunks_done"], counter["consumed"])
+    save_manifest(work_dir, manifest)
+    chunks_per_sec = embedded / elapsed if elapsed else 0.0
+    stats = {
+        "chunks": manifest["chunks_done"],
+        "vectors": sum(shard["count"] for shard in manifest["shards"]),
+        "embedded_this_run": embedded,
+        "seconds": elapsed,
+        "chunks_per_sec": chunks_per_sec,
+    }
+    if dedup is not None:
+        dd = dedup.stats()
+        dim = vectors.shape[1] if embedded else 0
+        stats["dedup"] = dict(
+            dd,
+            # What the dropped chunks would have cost: flat float32 vectors + embedding time.
+            saved_index_bytes=dd["dropped"] * dim * 4,
+            saved_embed_seconds=dd["dropped"] / chunks_per_sec if chunks_per_sec else 0.0
+        )
+        log(f"Dedup dropped {dd['dropped']} of {dd['seen']} chunks ({dd['dropped_ratio']:.1%}): "
+            f"{dd['exact_dupes']} exact, {dd['near_dupes']} near-duplicate")
+    return stats
+
+def write_flat_index(work_dir, index_dir, embeddings):
+    """Merges shards into a LangChain FAISS store, holding one shard's raw data at a time."""
+    from langchain_community.vectorstores import FAISS
+    vectorstore = None
+    for texts, vectors in iter_shards(work_dir):
+        pairs = list(zip(texts, vectors.tolist()))
+        if vectorstore is None:
+            vectorstore = FAISS.from_embeddings(pairs, embeddings)
+        else:
+            vectorstore.add_embeddings(pairs)
+    if vectorstore is None:
+        raise ValueError(f"No shards found in {work_dir}")
+
+    # Save next to the target and swap in, so a crash never leaves a half-written index.
+    tmp_dir = f"{index_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    vectorstore.save_local(tmp_dir)
+    shutil.rmtree(index_dir, ignore_errors=True)
+    os.replace(tmp_dir, index_dir)
+    return vectorstore
+
+def build_index(index_dir, embeddings, ds_names=HF_DATASETS, chunk_size=CHUNK_SIZE,
+                chunk_overlap=CHUNK_OVERLAP, batch_size=BATCH_SIZE, log=print,
+                work_dir=None, writer=write_flat_index, dedup=True):
+    """Streaming, checkpointed replacement for the old all-in-memory FAISS.from_texts build.
+
+    `writer(work_dir, index_dir, embeddings)` turns the finished shards into the
+    served index; several formats can share one `work_dir` of shards.
+    """
+    work_dir = work_dir or f"{index_dir}.build"
+    manifest = load_manifest(work_dir)
+    if not manifest["complete"]:
+        chunks = iter_chunks(iter_dataset_texts(ds_names), chunk_size, chunk_overlap)
+        deduper = ChunkDeduplicator() if dedup else None
+        stats = build_shards(work_dir, embeddings, chunks, batch_size, log, deduper)
+        manifest = load_manifest(work_dir)
+        manifest["complete"] = True
+        manifest["stats"] = stats
+        save_manifest(work_dir, manifest)
+    writer(work_dir, index_dir, embeddings)
+    log(f"Index written to {index_dir}: {manifest['stats']}")
+    return manifest["stats"]
+
+if __name__ == "__main__":
+    import argparse
+    from embedding_backend import get_embeddings
+
+    parser = argparse.ArgumentParser(description="Build the Fibot FAISS index in resumable shards.")
+    parser.add_argument("--index-dir", default="faiss_index")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--chunk-overlap", type=int, default=CHUNK_OVERLAP)
+    parser.add_argument("--embed-backend", default="hf", choices=["hf", "onnx"])
+    parser.add_argument("--no-dedup", action="store_true", help="Embed exact and near-duplicate chunks too")
+    args = parser.parse_args()
+
+    embeddings = get_embeddings(args.embed_backend, EMBED_MODEL)
+    build_index(args.index_dir, embeddings, chunk_size=args.chunk_size,
+                chunk_overlap=args.chunk_overlap, batch_size=args.batch_size, dedup=not args.no_dedup)
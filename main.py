@@ -1,11 +1,33 @@
 import streamlit as st
+import importlib, sys, time
 from urllib.parse import urlencode
-import budget_summaries
-import spending_insights
-import NLU_Analysis
-import rag_granite_finance
-import about_fibot
-import dream_tracker  # New Pro Module
+
+_run_start = time.perf_counter()
+
+# Page modules are imported on first visit only; the home page pulls in none of them
+# (and so none of pandas, matplotlib, reportlab, genai, speech_recognition, pymongo).
+ROUTES = {
+    "chatbot": "rag_granite_finance",
+    "try": "rag_granite_finance",
+    "budget": "budget_summaries",
+    "spending": "spending_insights",
+    "dreams": "dream_tracker",
+    "nlu": "NLU_Analysis",
+    "know": "about_fibot",
+}
+
+@st.cache_resource
+def route_import_times():
+    """Process-wide record of what each route's first import cost (seconds)."""
+    return {}
+
+def load_route(module_name):
+    times = route_import_times()
+    start = time.perf_counter()
+    # Warm modules come straight from sys.modules after the first visit.
+    module = importlib.import_module(module_name)
+    times.setdefault(module_name, time.perf_counter() - start)
+    return module
 
 st.set_page_config(page_title="Fibot Pro - AI Finance Companion", page_icon="💰", layout="wide")
 
@@ -193,18 +215,8 @@ st.markdown(f"""
 """, unsafe_allow_html=True)
 
 # Routing
-if page == "chatbot" or page == "try":
-    rag_granite_finance.main()
-elif page == "budget":
-    budget_summaries.main()
-elif page == "spending":
-    spending_insights.main()
-elif page == "dreams":
-    dream_tracker.main()
-elif page == "nlu":
-    NLU_Analysis.main()
-elif page == "know":
-    about_fibot.main()
+if page in ROUTES:
+    load_route(ROUTES[page]).main()
 else:
     # --- PRO HOME PAGE ---
     st.markdown("""
@@ -228,4 +240,22 @@ else:
         return html + "</div></div>"
 
     st.markdown(render_row(q1), unsafe_allow_html=True)
-    st.markdown(render_row(q2, True), unsafe_allow_html=True)
\ No newline at end of file
+    st.markdown(render_row(q2, True), unsafe_allow_html=True)
+
+# Startup report: ?debug=1 shows what each route cost to import and this run's render time
+if params.get("debug") == "1":
+    with st.sidebar.expander("⏱ Startup report", expanded=True):
+        st.write(f"This run: {(time.perf_counter() - _run_start) * 1000:.0f} ms")
+        imported = route_import_times()
+        if imported:
+            st.table({"module": list(imported), "first import (ms)": [round(t * 1000) for t in imported.values()]})
+        else:
+            st.write("No page modules imported yet.")
+        # Hit rate of the per-collection versioned caches (see cache_versions.py)
+        cache_stats = importlib.import_module("cache_versions").stats()
+        if cache_stats:
+            st.dataframe(cache_stats, use_container_width=True, hide_index=True)
+        # Outcome of the background index check started by db_utils.get_db()
+        if "db_utils" in sys.modules:
+            status = sys.modules["db_utils"].index_status()
+            st.write(f"MongoDB indexes: {status['state']} {status['detail']}")
@@ -0,0 +1,142 @@
+import json, mmap, os, shutil, time
+from pathlib import Path
+import numpy as np
+import faiss
+from langchain_core.documents import Document
+import index_builder
+
+# --- ON-DISK FORMAT ---
+# vectors.ivfpq : FAISS IVF-PQ index, memory-mapped read-only
+# texts.bin     : UTF-8 chunk texts, concatenated
+# offsets.npy   : int64 byte offsets into texts.bin (count + 1 entries)
+# meta.json     : format version, embedding model and index parameters
+FORMAT_VERSION = "ivfpq-mmap-v1"
+VECTORS_FILE = "vectors.ivfpq"
+TEXTS_FILE = "texts.bin"
+OFFSETS_FILE = "offsets.npy"
+META_FILE = "meta.json"
+
+PQ_M = 16          # 384-d MiniLM vectors -> 16 bytes per vector
+PQ_BITS = 8
+TRAIN_SAMPLE = 65536
+NPROBE = 16
+
+def _nlist_for(count, sample_size):
+    """~4*sqrt(n) lists, capped so every centroid gets ~39 training points."""
+    return int(max(1, min(4 * np.sqrt(count), sample_size // 39)))
+
+def _training_sample(work_dir, total):
+    """Strided sample across all shards, so every source dataset is represented."""
+    stride = max(1, int(np.ceil(total / TRAIN_SAMPLE)))
+    sample = [vectors[::stride] for _, vectors in index_builder.iter_shards(work_dir)]
+    return np.ascontiguousarray(np.concatenate(sample), dtype="float32")
+
+def write_ivfpq_index(work_dir, index_dir, embeddings=None):
+    """Converts finished build shards into the memory-mappable IVF-PQ format."""
+    manifest = index_builder.load_manifest(work_dir)
+    total = sum(shard["count"] for shard in manifest["shards"])  # Vectors kept after dedup
+    if not total:
+        raise ValueError(f"No shards found in {work_dir}")
+
+    sample = _training_sample(work_dir, total)
+    dim = sample.shape[1]
+    nlist = _nlist_for(total, len(sample))
+    index = faiss.IndexIVFPQ(faiss.IndexFlatL2(dim), dim, nlist, PQ_M, PQ_BITS)
+    index.train(sample)
+    del sample
+
+    tmp_dir = Path(f"{index_dir}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    offsets = np.lib.format.open_memmap(tmp_dir / OFFSETS_FILE, mode="w+", dtype="int64", shape=(total + 1,))
+    pos, row = 0, 0
+    with open(tmp_dir / TEXTS_FILE, "wb") as f:
+        for texts, vectors in index_builder.iter_shards(work_dir):
+            index.add(np.ascontiguousarray(vectors, dtype="float32"))
+            for txt in texts:
+                offsets[row] = pos
+                data = txt.encode("utf-8")
+                f.write(data)
+                pos += len(data)
+                row += 1
+    offsets[row] = pos
+    offsets.flush()
+    del offsets
+
+    faiss.write_index(index, str(tmp_dir / VECTORS_FILE))
+    meta = {
+        "format": FORMAT_VERSION,
+        "embed_model": getattr(embeddings, "model_name", index_builder.EMBED_MODEL),
+        "count": total,
+        "dim": dim,
+        "nlist": nlist,
+        "pq_m": PQ_M,
+        "pq_bits": PQ_BITS,
+    }
+    with open(tmp_dir / META_FILE, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    shutil.rmtree(index_dir, ignore_errors=True)
+    os.replace(tmp_dir, index_dir)
+    return meta
+
+# --- READ-ONLY STORE ---
+class MmapVectorStore:
+    """Drop-in for the similarity_search calls made on the LangChain FAISS store.
+
+    Nothing is unpickled and nothing is copied at load: vectors and texts are
+    mapped read-only, so every process on the host shares the same page cache.
+    """
+
+    def __init__(self, index_dir, embeddings, nprobe=NPROBE):
+        index_dir = Path(index_dir)
+        with open(index_dir / META_FILE, "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported index format in {index_dir}: {self.meta.get('format')}")
+
+        self.embeddings = embeddings
+        self.index = faiss.read_index(str(index_dir / VECTORS_FILE), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        self.index.nprobe = nprobe
+        self.offsets = np.load(index_dir / OFFSETS_FILE, mmap_mode="r")
+        with open(index_dir / TEXTS_FILE, "rb") as f:
+            self._texts = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return self.index.ntotal
+
+    def text(self, i):
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self._texts[start:end].decode("utf-8")
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4):
+        query = np.asarray([embedding], dtype="float32")
+        scores, ids = self.index.search(query, k)
+        return [
+            (Document(page_content=self.text(i), metadata={"id": int(i)}), float(s))
+            for s, i in zip(scores[0], ids[0]) if i != -1
+        ]
+
+    def similarity_search_by_vector(self, embedding, k=4):
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search(self, query, k=4):
+        return self.similarity_search_by_vector(self.embeddings.embed_query(query), k)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert build shards to the mmap IVF-PQ index and time a cold load.")
+    parser.add_argument("--work-dir", default="faiss_index.build")
+    parser.add_argument("--index-dir", default="faiss_index_ivfpq")
+    parser.add_argument("--skip-build", action="store_true")
+    args = parser.parse_args()
+
+    if not args.skip_build:
+        start = time.perf_counter()
+        meta = write_ivfpq_index(args.work_dir, args.index_dir)
+        print(f"Wrote {meta['count']} vectors (nlist={meta['nlist']}) in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    store = MmapVectorStore(args.index_dir, embeddings=None)
+    print(f"Cold load: {(time.perf_counter() - start) * 1000:.1f} ms for {len(store)} vectors")
@@ -0,0 +1,269 @@
+import contextvars, threading, time
+from collections import deque
+from itertools import chain
+from rate_limiter import RateLimitBusy
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# --- BREAKER CONFIG ---
+FAILURE_THRESHOLD = 3        # Consecutive failures before a model is skipped
+COOLDOWN_S = 60              # How long a tripped model is skipped before one probe request
+PERMANENT_COOLDOWN_S = 900   # 404 / 403: the model is gone or not enabled for this key
+LATENCY_WINDOW = 50
+
+class AllModelsFailed(Exception):
+    """No model in the chain produced an answer (or every breaker was open)."""
+
+class StreamInterrupted(Exception):
+    """A stream broke after text was already shown; `partial` is what arrived before it did."""
+
+    def __init__(self, model, partial, error):
+        super().__init__(f"{model} stream interrupted: {error}")
+        self.model = model
+        self.partial = partial
+
+def _is_permanent(error):
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    return code in (403, 404) or "NOT_FOUND" in str(error)
+
+def _give_up(errors):
+    """Every model was tried or skipped: "busy" if only our rate limiter refused, else AllModelsFailed."""
+    summary = "; ".join(f"{model}: {e}" for model, e in errors)
+    if errors and all(isinstance(e, RateLimitBusy) for _, e in errors):
+        raise RateLimitBusy(summary)
+    raise AllModelsFailed(summary or "All model circuit breakers are open")
+
+class CircuitBreaker:
+    """closed -> open after repeated failures -> half_open (one probe) after the cooldown."""
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, cooldown_s=COOLDOWN_S):
+        self.failure_threshold = failure_threshold
+        self.cooldown_s = cooldown_s
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.open_for = cooldown_s
+        self._probe_in_flight = False
+
+    def allow(self, now):
+        if self.state == "closed":
+            return True
+        if self.state == "open" and now - self.opened_at >= self.open_for:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.state, self.failures, self._probe_in_flight = "closed", 0, False
+
+    def release(self):
+        """An abandoned request counts as neither success nor failure, but frees the probe slot."""
+        self._probe_in_flight = False
+
+    def record_failure(self, now, permanent=False):
+        self.failures += 1
+        self._probe_in_flight = False
+        if permanent or self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = now
+            self.open_for = PERMANENT_COOLDOWN_S if permanent else self.cooldown_s
+
+    def remaining(self, now):
+        return max(0.0, self.open_for - (now - self.opened_at)) if self.state == "open" else 0.0
+
+class ModelRouter:
+    """Fallback chain over several models with per-model circuit breakers and optional hedging.
+
+    `call(model_name, prompt)` does the actual request and returns the text;
+    the optional `stream_call(model_name, prompt)` yields the text in chunks.
+    Models whose breaker is open are skipped instead of adding their timeout
+    to every question. With `hedge_after` set, the next model is started when
+    the current one has not answered within that many seconds, and the first
+    successful answer wins.
+    """
+
+    def __init__(self, call, models, hedge_after=None, max_workers=8, stream_call=None):
+        self.call = call
+        self.stream_call = stream_call
+        self.models = list(models)
+        self.hedge_after = hedge_after
+        self._breakers = {m: CircuitBreaker() for m in self.models}
+        self._latency = {m: deque(maxlen=LATENCY_WINDOW) for m in self.models}
+        self._counts = {m: {"ok": 0, "failed": 0, "skipped": 0, "busy": 0} for m in self.models}
+        self._last_error = {m: None for m in self.models}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="model-router")
+
+    # --- Health bookkeeping ---
+    def _acquire(self, model):
+        with self._lock:
+            allowed = self._breakers[model].allow(time.monotonic())
+            if not allowed:
+                self._counts[model]["skipped"] += 1
+            return allowed
+
+    def _record_failure(self, model, error):
+        with self._lock:
+            self._breakers[model].record_failure(time.monotonic(), _is_permanent(error))
+            self._counts[model]["failed"] += 1
+            self._last_error[model] = f"{type(error).__name__}: {error}"[:200]
+
+    def _record_success(self, model, seconds):
+        with self._lock:
+            self._breakers[model].record_success()
+            self._latency[model].append(seconds)
+            self._counts[model]["ok"] += 1
+
+    def _release(self, model, busy=False):
+        with self._lock:
+            self._breakers[model].release()
+            if busy:
+                self._counts[model]["busy"] += 1
+
+    def _run(self, model, prompt):
+        start = time.monotonic()
+        try:
+            text = self.call(model, prompt)
+        except RateLimitBusy:
+            # Our own limiter said no: the model is healthy, try the next one.
+            self._release(model, busy=True)
+            raise
+        except Exception as e:
+            self._record_failure(model, e)
+            raise
+        self._record_success(model, time.monotonic() - start)
+        return text
+
+    def snapshot(self):
+        """Per-model breaker state and latency, for display."""
+        now = time.monotonic()
+        rows = []
+        with self._lock:
+            for m in self.models:
+                lat = sorted(self._latency[m])
+                breaker = self._breakers[m]
+                rows.append({
+                    "model": m,
+                    "state": breaker.state,
+                    "cooldown_left_s": round(breaker.remaining(now), 1),
+                    "p50_s": round(lat[len(lat) // 2], 2) if lat else None,
+                    "p95_s": round(lat[min(len(lat) - 1, int(len(lat) * 0.95))], 2) if lat else None,
+                    **self._counts[m],
+                    "last_error": self._last_error[m],
+                })
+        return rows
+
+    # --- Generation ---
+    def generate(self, prompt):
+        """Returns (text, model_name) from the first model that answers."""
+        if self.hedge_after is None:
+            return self._sequential(prompt)
+        return self._hedged(prompt)
+
+    def stream(self, prompt):
+        """A ModelStream over the first model that starts answering (needs `stream_call`)."""
+        if self.stream_call is None:
+            raise ValueError("This router was created without a stream_call")
+        return ModelStream(self, prompt)
+
+    def _sequential(self, prompt):
+        errors = []
+        for model in self.models:
+            if not self._acquire(model):
+                continue
+            try:
+                return self._run(model, prompt), model
+            except Exception as e:
+                errors.append((model, e))
+        _give_up(errors)
+
+    def _hedged(self, prompt):
+        remaining = iter(self.models)
+        in_flight, errors = {}, []
+
+        def launch_next():
+            for model in remaining:
+                if self._acquire(model):
+                    # Copy the caller's context, so a shared rate-limit budget also covers hedges.
+                    ctx = contextvars.copy_context()
+                    in_flight[self._pool.submit(ctx.run, self._run, model, prompt)] = model
+                    return True
+            return False
+
+        launch_next()
+        while in_flight:
+            done, _ = wait(in_flight, timeout=self.hedge_after, return_when=FIRST_COMPLETED)
+            if not done:
+                # Slow answer: start the next model alongside it.
+                launch_next()
+                continue
+            for future in done:
+                model = in_flight.pop(future)
+                try:
+                    # Losing requests keep running; their outcome still updates health.
+                    return future.result(), model
+                except Exception as e:
+                    errors.append((model, e))
+                    launch_next()
+        _give_up(errors)
+
+class ModelStream:
+    """Iterates the text chunks of one streamed answer and records how it went.
+
+    Falls back to the next model only until the first chunk arrives; once text
+    is on screen a failure raises StreamInterrupted instead of restarting the
+    answer with another model. No hedging: two streams would race on screen.
+    """
+
+    def __init__(self, router, prompt):
+        self._router = router
+        self.prompt = prompt
+        self.model = None
+        self.first_chunk_s = None
+        self.total_s = None
+        self.completed = False
+        self._parts = []
+
+    @property
+    def text(self):
+        return "".join(self._parts)
+
+    def __iter__(self):
+        router, start, errors = self._router, time.monotonic(), []
+        for model in router.models:
+            if not router._acquire(model):
+                continue
+            try:
+                chunks = iter(router.stream_call(model, self.prompt))
+                first = next(chunks, "")
+            except RateLimitBusy as e:
+                router._release(model, busy=True)
+                errors.append((model, e))
+                continue
+            except Exception as e:
+                router._record_failure(model, e)
+                errors.append((model, e))
+                continue
+            self.model = model
+            self.first_chunk_s = time.monotonic() - start
+            yield from self._relay(model, first, chunks, start)
+            return
+        _give_up(errors)
+
+    def _relay(self, model, first, chunks, start):
+        try:
+            for chunk in chain([first], chunks):
+                if chunk:
+                    self._parts.append(chunk)
+                    yield chunk
+        except GeneratorExit:
+            # The page stopped reading (rerun / closed tab): not the model's fault.
+            self._router._release(model)
+            raise
+        except Exception as e:
+            self._router._record_failure(model, e)
+            raise StreamInterrupted(model, self.text, e) from e
+        self.total_s = time.monotonic() - start
+        self.completed = True
+        self._router._record_success(model, self.total_s)
@@ -1,173 +1,209 @@
 import streamlit as st
 from pathlib import Path
-from datasets import load_dataset
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
-from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
-import torch, io, csv, os
-from streamlit_mic_recorder import mic_recorder
-import speech_recognition as sr
-
-HISTORY_FILE = "search_history.csv"
-
-# ----------------------------- Save & Load History -----------------------------
-def load_history_from_csv():
-    history = []
-    if os.path.exists(HISTORY_FILE):
-        with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-            reader = csv.reader(f)
-            for row in reader:
-                if len(row) >= 2:  # Only Q and A
-                    q = row[0]
-                    a = row[1]
-                    history.append((q, a))
-    return history
-
-def save_history_to_csv(history):
-    with open(HISTORY_FILE, "w", encoding="utf-8", newline="") as f:
-        writer = csv.writer(f)
-        for q, a in history:
-            writer.writerow([q, a])
+import logging, os, time
+from voice_recorder import voice_input
+import index_builder
+import mmap_index
+from semantic_cache import SemanticCache
+from granite_llm import GRANITE_MODEL, MAX_NEW_TOKENS, PRECISION, USE_ASSISTED, load_granite, load_draft_model, build_prompt, GraniteGenerator
+from concurrent.futures import TimeoutError as FutureTimeout
+from granite_worker import GraniteWorker, WorkerDied
+from history_store import HistoryStore
+from embedding_backend import EMBED_MODEL, EMBED_BACKEND, get_embeddings
+
+log = logging.getLogger(__name__)
+
+HISTORY_LIMIT = 20  # Sidebar entries shown; older ones are reachable through search
+
+@st.cache_resource
+def get_history_store():
+    return HistoryStore()
 
 def main():
     if "voice_text" not in st.session_state:
         st.session_state.voice_text = ""
-    if "history" not in st.session_state:
-        st.session_state.history = load_history_from_csv()  # Load persisted history
+    history_store = get_history_store()
     if "selected_history" not in st.session_state:
         st.session_state.selected_history = None
 
     INDEX_DIR = "faiss_index"
-    EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
-    GRANITE_MODEL = "ibm-granite/granite-3.3-2b-instruct"
+    MMAP_INDEX_DIR = "faiss_index_ivfpq"
+    BUILD_DIR = "faiss_index.build"  # Shards shared by both index formats
+    INDEX_FORMAT = os.getenv("FIBOT_INDEX_FORMAT", "flat")  # "flat" or "ivfpq"
+    USE_WORKER = os.getenv("FIBOT_GRANITE_WORKER", "0") == "1"  # Batched out-of-process inference
+    STREAM_ANSWERS = os.getenv("FIBOT_STREAM", "1") == "1" and not USE_WORKER  # Worker batches are not streamed
     CHUNK_SIZE = 500
     CHUNK_OVERLAP = 50
     TOP_K = 2
+    CACHE_DIR = "semantic_cache"
+    CACHE_THRESHOLD = float(os.getenv("FIBOT_CACHE_THRESHOLD", "0.92"))  # Min cosine similarity for a hit
 
     @st.cache_resource
     def build_or_load_faiss():
-        if Path(INDEX_DIR).exists():
-            embeddings = HuggingFaceEmbeddings(model_name=EMBED_MODEL)
-            return FAISS.load_local(INDEX_DIR, embeddings, allow_dangerous_deserialization=True)
-
-        hf_datasets = [
-            "SALT-NLP/FLUE-FiQA",
-            "sujet-ai/Sujet-Finance-Instruct-177k",
-            "bilalRahib/fiqa-personal-finance-dataset" 
-        ]
-        all_texts = []
-        for ds_name in hf_datasets:
-            ds = load_dataset(ds_name)
-            train = ds["train"]
-            cols = train.column_names
-            if "text" in cols:
-                all_texts.extend(train["text"])
-            elif "sentence" in cols:
-                all_texts.extend(train["sentence"])
-            elif "question" in cols and "answer" in cols:
-                all_texts.extend([f"Q: {q}\nA: {a}" for q, a in zip(train["question"], train["answer"])])
-            else:
-                all_texts.extend(train[cols[0]])
-
-        splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
-        chunks = []
-        for txt in all_texts:
-            chunks.extend(splitter.split_text(str(txt)))
-
-        embeddings = HuggingFaceEmbeddings(model_name=EMBED_MODEL)
-        vectorstore = FAISS.from_texts(chunks, embeddings)
-        vectorstore.save_local(INDEX_DIR)
-        return vectorstore
+        # Same backend (HF or ONNX) for bulk build and queries; queries go through an LRU.
+        embeddings = get_embeddings(EMBED_BACKEND, EMBED_MODEL)
+        if INDEX_FORMAT == "ivfpq":
+            # Compressed vectors + offset-indexed texts, mapped read-only and shared across workers.
+            if not Path(MMAP_INDEX_DIR).exists():
+                index_builder.build_index(
+                    MMAP_INDEX_DIR,
+                    embeddings,
+                    chunk_size=CHUNK_SIZE,
+                    chunk_overlap=CHUNK_OVERLAP,
+                    work_dir=BUILD_DIR,
+                    writer=mmap_index.write_ivfpq_index
+                )
+            return mmap_index.MmapVectorStore(MMAP_INDEX_DIR, embeddings)
+
+        if not Path(INDEX_DIR).exists():
+            # Streams the datasets and checkpoints shards, so a crash resumes instead of restarting.
+            index_builder.build_index(
+                INDEX_DIR,
+                embeddings,
+                chunk_size=CHUNK_SIZE,
+                chunk_overlap=CHUNK_OVERLAP,
+                work_dir=BUILD_DIR
+            )
+        return FAISS.load_local(INDEX_DIR, embeddings, allow_dangerous_deserialization=True)
 
     @st.cache_resource
     def load_granite_llm():
-        tokenizer = AutoTokenizer.from_pretrained(GRANITE_MODEL)
-        if torch.cuda.is_available():
-            model = AutoModelForCausalLM.from_pretrained(
-                GRANITE_MODEL,
-                torch_dtype=torch.float16,
-                device_map=None
-            )
-            model=model.to("cuda")
-        else:
-            model = AutoModelForCausalLM.from_pretrained(
-                GRANITE_MODEL,
-                torch_dtype=torch.float32,
-                device_map={"": "cpu"}
-            )
-        return pipeline(
-            "text-generation",
-            model=model,
-            tokenizer=tokenizer,
-            max_new_tokens=256,
-            temperature=0.2,
-            do_sample=False
+        model, tokenizer = load_granite(GRANITE_MODEL)
+        # Either a small draft model for assisted decoding, or the precomputed
+        # KV cache of the fixed system preamble (set up once per process).
+        draft = load_draft_model(model, tokenizer) if USE_ASSISTED else None
+        return GraniteGenerator(model, tokenizer, assistant_model=draft)
+
+    @st.cache_resource
+    def load_granite_worker():
+        # One model process for the whole server; sessions only hold futures.
+        return GraniteWorker(GRANITE_MODEL)
+
+    def generate_answer(prompt):
+        if USE_WORKER:
+            try:
+                return load_granite_worker().generate(prompt, max_new_tokens=MAX_NEW_TOKENS)
+            except WorkerDied:
+                # e.g. OOM while loading the model: start a fresh worker on the next question
+                load_granite_worker.clear()
+                raise
+        return load_granite_llm().generate(prompt, max_new_tokens=MAX_NEW_TOKENS)
+
+    @st.cache_resource
+    def load_answer_cache():
+        # Shared by all sessions; answers are only valid for this model + index combination.
+        return SemanticCache(
+            CACHE_DIR,
+            threshold=CACHE_THRESHOLD,
+            namespace=f"{GRANITE_MODEL}|{PRECISION}|{EMBED_MODEL}|{INDEX_FORMAT}"
         )
 
-    def answer_question(granite_pipe, vectorstore, question):
-        docs = vectorstore.similarity_search(question, k=TOP_K)
+    def stream_answer(prompt, metrics, start):
+        for piece in load_granite_llm().stream(prompt, MAX_NEW_TOKENS):
+            if piece and "ttft" not in metrics:
+                metrics["ttft"] = time.perf_counter() - start
+            yield piece
+
+    def answer_question(vectorstore, answer_cache, question, live=None):
+        """Returns (answer, sources, metrics); tokens are also streamed into `live` if given."""
+        start = time.perf_counter()
+        metrics = {}
+        # Embed once: the same vector drives the cache lookup and the retrieval.
+        query_vec = vectorstore.embeddings.embed_query(question)
+        cached = answer_cache.lookup(query_vec)
+        if cached:
+            if live:
+                live.write(cached["answer"])
+            metrics.update(cached=True, ttft=time.perf_counter() - start, total=time.perf_counter() - start)
+            return cached["answer"], cached["sources"], metrics
+
+        docs = vectorstore.similarity_search_by_vector(query_vec, k=TOP_K)
         context = "\n\n---\n\n".join([d.page_content for d in docs]) or "No relevant context found."
-        prompt = (
-            f"You are a financial assistant. "
-            f"Use ONLY the context below to answer the question.\n\n"
-            f"Context:\n{context}\n\n"
-            f"Question: {question}\nAnswer:"
-        )
-        output = granite_pipe(prompt, max_new_tokens=256, temperature=0.2, do_sample=False, return_full_text=False)
-        answer = output[0]['generated_text'].strip()
-        return answer, [d.page_content for d in docs]
+        prompt = build_prompt(context, question)
+        if live:
+            # TTFT is measured from the question, so embedding and retrieval count towards it.
+            answer = live.write_stream(stream_answer(prompt, metrics, start)).strip()
+        else:
+            answer = generate_answer(prompt)
+        metrics["total"] = time.perf_counter() - start
+        sources = [d.page_content for d in docs]
+        answer_cache.store(question, query_vec, answer, sources)
+        return answer, sources, metrics
 
     st.set_page_config(page_title="Finance Chatbot", layout="wide")
     st.title("💬 Finance Chatbot (IBM Granite )")
 
-    # Sidebar: Show persisted history
+    # Sidebar: Recent history, with full-text search over older entries
     st.sidebar.header("📜 Search History")
-    if st.session_state.history:
-        for idx, (q, a) in enumerate(st.session_state.history):
-            if st.sidebar.button(q[:30] + ("..." if len(q) > 30 else ""), key=f"hist_{idx}"):
+    history_query = st.sidebar.text_input("Search history", key="history_search", placeholder="e.g. SIP")
+    if history_query.strip():
+        entries = history_store.search(history_query, HISTORY_LIMIT)
+    else:
+        entries = history_store.recent(HISTORY_LIMIT)
+    if entries:
+        for entry_id, q in entries:
+            if st.sidebar.button(q[:30] + ("..." if len(q) > 30 else ""), key=f"hist_{entry_id}"):
+                q, a = history_store.get(entry_id)
                 st.session_state.selected_history = (q, a, [])
     else:
-        st.sidebar.write("No searches yet.")
+        st.sidebar.write("No matches." if history_query.strip() else "No searches yet.")
 
     vectorstore = build_or_load_faiss()
-    granite_pipe = load_granite_llm()
+    if USE_WORKER:
+        load_granite_worker()
+    else:
+        load_granite_llm()
+    answer_cache = load_answer_cache()
 
-    st.markdown("#### 🎙 Speak your query:")
-    audio_data = mic_recorder(
-        start_prompt="🎙 Start Recording",
-        stop_prompt="⏹ Stop Recording",
-        just_once=True,
-        use_container_width=True,
-        format="wav"
+    cache_stats = answer_cache.stats()
+    st.sidebar.caption(
+        f"⚡ Answer cache: {cache_stats['entries']} entries · "
+        f"{cache_stats['hits']} hits / {cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%})"
     )
 
-    if audio_data:
-        try:
-            wav_bytes = io.BytesIO(audio_data["bytes"])
-            recognizer = sr.Recognizer()
-            with sr.AudioFile(wav_bytes) as source:
-                audio = recognizer.record(source)
-            text = recognizer.recognize_google(audio)
-            st.session_state.voice_text = text
-            st.success(f"Recognized Speech: {text}")
-        except Exception as e:
-            st.error(f"Speech recognition error: {e}")
+    st.markdown("#### 🎙 Speak your query:")
+    text = voice_input(use_container_width=True)
+    if text:
+        st.session_state.voice_text = text
+        st.success(f"Recognized Speech: {text}")
 
     user_question = st.text_input("Ask your finance question:", placeholder="Ask Fibot?", value=st.session_state.voice_text)
 
-    if user_question.strip() and (not st.session_state.history or st.session_state.history[-1][0] != user_question):
+    streamed_now = False
+    if user_question.strip() and history_store.last_question() != user_question:
+        live = st.container() if STREAM_ANSWERS else None
+        if live:
+            live.subheader(f"🔍 {user_question}")
         with st.spinner("Generating answer..."):
-            answer, sources = answer_question(granite_pipe, vectorstore, user_question)
-        st.session_state.history.append((user_question, answer))
-        save_history_to_csv(st.session_state.history)  # Persist immediately
+            try:
+                answer, sources, metrics = answer_question(vectorstore, answer_cache, user_question, live)
+            except (FutureTimeout, TimeoutError):
+                # Worker timeout, or a streamed answer that stalled (GraniteGenerator.stream)
+                st.error("⚠️ Granite took too long to answer. Please try again in a moment.")
+                st.stop()
+            except WorkerDied as e:
+                st.error(f"⚠️ The Granite worker stopped ({e}). It restarts with your next question.")
+                st.stop()
+        # Persist only once the full answer exists, never a partial stream.
+        history_store.append(user_question, answer)  # Persist immediately (single append)
         st.session_state.selected_history = (user_question, answer, sources)
         st.session_state.voice_text = ""
+        streamed_now = live is not None
+
+        timing = f"full answer in {metrics['total']:.2f}s"
+        if "ttft" in metrics:
+            timing = f"first token after {metrics['ttft']:.2f}s · {timing}"
+        if metrics.get("cached"):
+            timing += " (from answer cache)"
+        st.caption(f"⏱ {timing}")
+        log.info("ttft=%.3fs total=%.3fs cached=%s", metrics.get("ttft", float("nan")), metrics["total"], bool(metrics.get("cached")))
 
     if st.session_state.selected_history:
         q, a, src = st.session_state.selected_history
-        st.subheader(f"🔍 {q}")
-        st.write(a)
+        if not streamed_now:
+            st.subheader(f"🔍 {q}")
+            st.write(a)
         if src:
             with st.expander("Sources"):
                 for i, s in enumerate(src, 1):
@@ -1,20 +1,52 @@
 import streamlit as st
-import io, os, time
+import logging, os, time
 from datetime import datetime
 from dotenv import load_dotenv
-from streamlit_mic_recorder import mic_recorder
-import speech_recognition as sr
+from voice_recorder import voice_input
 from google import genai
-from db_utils import get_db
+from db_utils import HISTORY_LIST_FIELDS, get_db
+from cache_versions import bump, versioned_cache
+import rate_limiter
+from rate_limiter import RateLimitBusy
+from model_router import AllModelsFailed, ModelRouter, StreamInterrupted
+
+log = logging.getLogger(__name__)
+
+# Active 2025 AI Models, in order of preference
+GEMINI_MODELS = ["gemini-3-flash", "gemini-2.5-flash", "gemini-2.0-flash"]
+# Start the next model if the current one has not answered after this many seconds ("" disables hedging)
+HEDGE_AFTER_S = os.getenv("GEMINI_HEDGE_AFTER_S", "6")
+# Render answers chunk by chunk as they arrive ("0" falls back to the spinner)
+STREAM_ANSWERS = os.getenv("GEMINI_STREAM", "1") == "1"
 
 # --- CACHED DATA FETCHING ---
-@st.cache_data(ttl=300) 
+@versioned_cache("search_history")
 def fetch_cloud_history_cached():
-    try:
-        db = get_db()
-        return list(db.search_history.find().sort("timestamp", -1).limit(12))
-    except Exception:
-        return []
+    db = get_db()
+    # Questions only: answers are fetched by _id when an entry is clicked
+    return list(db.search_history.find({}, HISTORY_LIST_FIELDS).sort("timestamp", -1).limit(12))
+
+# --- SHARED MODEL ROUTER ---
+# One router per process, so breaker state and latency history are shared by all sessions.
+@st.cache_resource
+def get_gemini_router():
+    api_key = os.getenv("GEMINI_API_KEY4", "")
+    client = genai.Client(api_key=api_key)
+
+    # Every request waits for its key/model's turn in the shared limiter before it is sent.
+    def call(model_name, contents):
+        rate_limiter.acquire(api_key, model_name)
+        response = client.models.generate_content(model=model_name, contents=contents)
+        return response.text.strip()
+
+    def stream_call(model_name, contents):
+        rate_limiter.acquire(api_key, model_name)
+        for chunk in client.models.generate_content_stream(model=model_name, contents=contents):
+            if chunk.text:
+                yield chunk.text
+
+    return ModelRouter(call, GEMINI_MODELS, hedge_after=float(HEDGE_AFTER_S) if HEDGE_AFTER_S else None,
+                       stream_call=stream_call)
 
 def main():
     load_dotenv()
@@ -25,56 +57,87 @@ def main():
     if "user_query" not in st.session_state: st.session_state.user_query = ""
     if "selected_history" not in st.session_state: st.session_state.selected_history = None
     if "last_request_time" not in st.session_state: st.session_state.last_request_time = 0
+    if "answer_timing" not in st.session_state: st.session_state.answer_timing = None
 
-    GEMINI_API_KEY4 = os.getenv("GEMINI_API_KEY4", "")
-    client = genai.Client(api_key=GEMINI_API_KEY4)
+    router = get_gemini_router()
+
+    def advisor_prompt(question):
+        return f"You are a professional financial advisor. Answer this clearly: {question}"
 
     def answer_question(question):
         try:
-            # Active 2025 AI Models
-            models_to_try = ["gemini-3-flash", "gemini-2.5-flash", "gemini-2.0-flash"]
-            for model_name in models_to_try:
-                try:
-                    response = client.models.generate_content(
-                        model=model_name,
-                        contents=f"You are a professional financial advisor. Answer this clearly: {question}"
-                    )
-                    return response.text.strip()
-                except Exception:
-                    continue
+            # Models with an open circuit breaker are skipped instead of timing out again;
+            # all of them together wait at most MAX_WAIT_S for the rate limiter.
+            with rate_limiter.request_budget():
+                answer, _ = router.generate(advisor_prompt(question))
+            return answer
+        except RateLimitBusy:
+            return None
+        except AllModelsFailed:
             return "⚠️ No available models found. Check cloud API permissions."
         except Exception as e:
             return f"⚠️ Response Error: {str(e)}"
+
+    def stream_answer(question):
+        """Writes the answer as it arrives; returns (answer, timing), or (None, None) if it did not finish."""
+        stream = router.stream(advisor_prompt(question))
+        try:
+            with rate_limiter.request_budget():
+                answer = st.write_stream(stream)
+        except StreamInterrupted as e:
+            # Keep what was shown, but never store a half answer as if it were complete.
+            st.warning(f"⚠️ The answer was cut off ({e}). Nothing was saved — please search again.")
+            return None, None
+        except RateLimitBusy:
+            st.warning(rate_limiter.BUSY_MESSAGE)
+            return None, None
+        except AllModelsFailed:
+            st.error("⚠️ No available models found. Check cloud API permissions.")
+            return None, None
+        except Exception as e:
+            st.error(f"⚠️ Response Error: {str(e)}")
+            return None, None
+        timing = {"question": question, "model": stream.model,
+                  "first_chunk_s": stream.first_chunk_s, "total_s": stream.total_s}
+        log.info("%s: first chunk %.2fs, full answer %.2fs", stream.model, stream.first_chunk_s, stream.total_s)
+        return answer.strip() if isinstance(answer, str) else stream.text.strip(), timing
+
     st.title("💬 Finance Chatbot")
 
     # --- Sidebar: History Selection ---
     st.sidebar.header("📜 Cloud Search History")
-    cloud_history = fetch_cloud_history_cached()
+    try:
+        cloud_history = fetch_cloud_history_cached()
+    except Exception as e:
+        # Not cached, so the next rerun tries again
+        st.sidebar.warning(f"History unavailable: {e}")
+        cloud_history = []
     
     if cloud_history:
         for idx, doc in enumerate(cloud_history):
             q = doc.get("question", "No query")
-            a = doc.get("answer", "No answer")
             # When history button is clicked, we set the state and STOP the script 
             # to prevent it from reaching the AI generation logic below.
             if st.sidebar.button(q[:30] + "...", key=f"hist_{idx}"):
-                st.session_state.selected_history = (q, a)
+                full = history_col.find_one({"_id": doc["_id"]}, {"answer": 1}) or {}
+                st.session_state.selected_history = (q, full.get("answer", "No answer"))
+                st.session_state.answer_timing = None
                 st.session_state.user_query = "" # Clear input to prevent auto-search
                 st.rerun() 
     else:
         st.sidebar.write("No searches yet.")
 
+    # --- Sidebar: Model health (why answers are slow or failing) ---
+    with st.sidebar.expander("🩺 Model Health"):
+        st.dataframe(router.snapshot(), use_container_width=True, hide_index=True)
+        st.caption("Rate limiter queues (all sessions)")
+        st.dataframe(rate_limiter.snapshot(), use_container_width=True, hide_index=True)
+
     # 🎙 Speech Section
-    audio_data = mic_recorder(start_prompt="🎙 Speak", stop_prompt="⏹ Stop", just_once=True, format="wav")
-    if audio_data:
-        try:
-            wav_bytes = io.BytesIO(audio_data["bytes"])
-            recognizer = sr.Recognizer()
-            with sr.AudioFile(wav_bytes) as source:
-                audio = recognizer.record(source)
-            st.session_state.user_query = recognizer.recognize_google(audio)
-            st.rerun() 
-        except Exception: pass
+    spoken = voice_input(start_prompt="🎙 Speak", stop_prompt="⏹ Stop")
+    if spoken:
+        st.session_state.user_query = spoken
+        st.rerun()
 
     # ✍️ Manual Query Input
     user_question = st.text_input("Ask a question:", value=st.session_state.user_query)
@@ -83,19 +146,39 @@ def main():
     if st.button("Search"):
         query = user_question.strip()
         if query:
-            # Throttle to prevent "No available models" error from API spamming
+            # Per-session double-click guard; the Gemini quota itself is shared through rate_limiter
             if time.time() - st.session_state.last_request_time < 2:
                 st.warning("Please wait 2 seconds...")
+            elif STREAM_ANSWERS:
+                st.markdown("---")
+                st.subheader(f"🔍 {query}")
+                answer, timing = stream_answer(query)
+                st.session_state.last_request_time = time.time()
+
+                # Only a finished stream reaches the cloud history
+                if answer is not None:
+                    history_col.insert_one({"question": query, "answer": answer, "timestamp": datetime.now()})
+                    bump("search_history")
+                    st.session_state.selected_history = (query, answer)
+                    st.session_state.answer_timing = timing
+                    st.session_state.user_query = ""
+                    st.rerun()
+                # Don't show an older answer under the cut-off one
+                st.session_state.selected_history = None
             else:
                 with st.spinner("Fibot is generating a new answer..."):
                     answer = answer_question(query)
                     st.session_state.last_request_time = time.time()
-                
+
+                if answer is None:
+                    st.warning(rate_limiter.BUSY_MESSAGE)
+                    st.stop()
+
                 # Cloud Storage
                 history_col.insert_one({"question": query, "answer": answer, "timestamp": datetime.now()})
                 
-                # Update state and clear cache
-                st.cache_data.clear()
+                # Update state and invalidate the history readers
+                bump("search_history")
                 st.session_state.selected_history = (query, answer)
                 st.session_state.user_query = ""
                 st.rerun()
@@ -106,6 +189,10 @@ def main():
         st.markdown("---")
         st.subheader(f"🔍 {q_show}")
         st.info(a_show)
+        timing = st.session_state.answer_timing
+        if timing and timing["question"] == q_show:
+            st.caption(f"⚡ {timing['model']}: first words after {timing['first_chunk_s']:.2f}s, "
+                       f"full answer in {timing['total_s']:.2f}s")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
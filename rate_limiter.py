@@ -0,0 +1,122 @@
+import contextvars, hashlib, os, threading, time
+from collections import deque
+from contextlib import contextmanager
+
+# --- LIMITS (per API key and model, shared by every session in this process) ---
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "15"))              # Sustained requests per minute
+GEMINI_BURST = int(os.getenv("GEMINI_BURST", "3"))             # Requests allowed back to back
+MAX_QUEUE = int(os.getenv("GEMINI_MAX_QUEUE", "20"))           # Waiting callers before we answer "busy"
+MAX_WAIT_S = float(os.getenv("GEMINI_MAX_WAIT_S", "8"))        # Longest one question waits, across all models tried
+
+BUSY_MESSAGE = "⏳ Fibot is handling a lot of requests right now. Please try again in a few seconds."
+
+class RateLimitBusy(Exception):
+    """The request was not sent: the queue was full or the caller's turn did not come in time."""
+
+class TokenBucket:
+    """Token bucket with a bounded FIFO queue of waiters.
+
+    Callers are served strictly in arrival order, so a steady stream of new
+    requests cannot starve one that has been waiting.
+    """
+
+    def __init__(self, rate_per_min=GEMINI_RPM, burst=GEMINI_BURST, max_queue=MAX_QUEUE):
+        self.rate = rate_per_min / 60.0
+        self.burst = burst
+        self.max_queue = max_queue
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._waiters = deque()
+        self._cond = threading.Condition()
+        self.granted = self.rejected = 0
+        self.waited_s = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, timeout=MAX_WAIT_S, deadline=None):
+        """Blocks until a token is free; returns the seconds waited or raises RateLimitBusy.
+
+        `deadline` (time.monotonic() value) caps the wait further, so several
+        acquires can share one budget.
+        """
+        start = time.monotonic()
+        deadline = min(start + timeout, deadline if deadline is not None else float("inf"))
+        ticket = object()
+        with self._cond:
+            if len(self._waiters) >= self.max_queue:
+                self.rejected += 1
+                raise RateLimitBusy(f"{len(self._waiters)} requests already waiting")
+            self._waiters.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    is_head = self._waiters[0] is ticket
+                    if is_head and self.tokens >= 1:
+                        self.tokens -= 1
+                        self.granted += 1
+                        self.waited_s += now - start
+                        return now - start
+                    if now >= deadline:
+                        self.rejected += 1
+                        raise RateLimitBusy(f"no capacity within {deadline - start:.1f}s")
+                    if is_head:
+                        # Only the head knows when its token is due; answer "busy" now if that is too late.
+                        next_token = (1 - self.tokens) / self.rate
+                        if now + next_token > deadline:
+                            self.rejected += 1
+                            raise RateLimitBusy(f"next slot in {next_token:.1f}s")
+                        self._cond.wait(next_token)
+                    else:
+                        # The rest sleep until the queue moves (notify) or their deadline passes.
+                        self._cond.wait(deadline - now)
+            finally:
+                self._waiters.remove(ticket)
+                self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            self._refill(time.monotonic())
+            return {
+                "tokens": round(self.tokens, 2),
+                "queued": len(self._waiters),
+                "granted": self.granted,
+                "rejected": self.rejected,
+                "avg_wait_s": round(self.waited_s / self.granted, 2) if self.granted else 0.0,
+            }
+
+# --- PROCESS-WIDE REGISTRY ---
+_buckets = {}
+_request_deadline = contextvars.ContextVar("rate_limit_deadline", default=None)
+_buckets_lock = threading.Lock()
+
+def _key_id(api_key):
+    # Never keep the key itself around (it shows up in the health table).
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:8]
+
+def get_bucket(api_key, model):
+    key = (_key_id(api_key), model)
+    with _buckets_lock:
+        if key not in _buckets:
+            _buckets[key] = TokenBucket()
+        return _buckets[key]
+
+@contextmanager
+def request_budget(seconds=MAX_WAIT_S):
+    """Every acquire() inside the block shares one deadline (e.g. a whole model fallback chain)."""
+    token = _request_deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _request_deadline.reset(token)
+
+def acquire(api_key, model, timeout=MAX_WAIT_S):
+    """Waits for this key/model's turn; raises RateLimitBusy instead of queueing forever."""
+    return get_bucket(api_key, model).acquire(timeout, _request_deadline.get())
+
+def snapshot():
+    with _buckets_lock:
+        items = list(_buckets.items())
+    return [{"key": key_id, "model": model, **bucket.stats()} for (key_id, model), bucket in items]
@@ -0,0 +1,143 @@
+"""Per-month, per-category spend totals, kept up to date on every transaction insert.
+
+    python rollups.py rebuild    # backfill / repair from the raw transactions
+    python rollups.py check      # compare stored rollups with a fresh aggregation
+
+One document per (month, category):
+    {"_id": "2025-01|Food", "month": "2025-01", "category": "Food", "total": 12345.0, "count": 42}
+Readers sum at most months x categories documents instead of scanning transactions.
+On a database that predates the rollups, the first reader or writer backfills them.
+"""
+import threading
+from datetime import datetime
+from pymongo import UpdateOne
+
+ROLLUPS = "monthly_rollups"
+SAVINGS_CATEGORIES = ["Savings", "Investments", "Investment"]
+BACKFILLS = "derived_backfills"   # {"_id": derived collection, "built_at": datetime}, written by each rebuild
+
+# --- ONE-TIME BACKFILL ---
+_backfill_lock = threading.Lock()
+_backfilled = set()
+
+def mark_built(db, collection):
+    db[BACKFILLS].update_one({"_id": collection}, {"$set": {"built_at": datetime.now()}}, upsert=True)
+
+def backfill_once(db, collection, build):
+    """Runs build(db) if `collection` was never built from the raw transactions; True if it ran.
+
+    The marker, not emptiness, decides: after a deploy the first insert creates
+    one rollup, which must not pass for a complete collection. Checked once per
+    process; `build` writes the marker itself (see rebuild).
+    """
+    key = (db.name, collection)
+    if key in _backfilled:
+        return False
+    with _backfill_lock:
+        if key in _backfilled:
+            return False
+        missing = db[BACKFILLS].find_one({"_id": collection}) is None
+        if missing:
+            build(db)
+        _backfilled.add(key)
+    return missing
+
+def rollup_id(date_str, category):
+    return f"{date_str[:7]}|{category}"
+
+# --- WRITE PATH ---
+def _inc(doc):
+    return UpdateOne(
+        {"_id": rollup_id(doc["date"], doc["category"])},
+        {"$inc": {"total": doc["amount"], "count": 1},
+         "$setOnInsert": {"month": doc["date"][:7], "category": doc["category"]}},
+        upsert=True,
+    )
+
+def record_transactions(db, docs):
+    """Adds freshly inserted transactions to their rollups (one bulk round trip)."""
+    if backfill_once(db, ROLLUPS, rebuild):
+        return  # The backfill already counted these (they were inserted first)
+    ops = [_inc(doc) for doc in docs]
+    if ops:
+        db[ROLLUPS].bulk_write(ops, ordered=False)
+
+def record_transaction(db, doc):
+    record_transactions(db, [doc])
+
+# --- REBUILD / CHECK ---
+def _rollup_pipeline():
+    return [
+        {"$group": {"_id": {"month": {"$substrBytes": ["$date", 0, 7]}, "category": "$category"},
+                    "total": {"$sum": "$amount"}, "count": {"$sum": 1}}},
+        {"$project": {"_id": {"$concat": ["$_id.month", "|", "$_id.category"]},
+                      "month": "$_id.month", "category": "$_id.category", "total": 1, "count": 1}},
+    ]
+
+def rebuild(db):
+    """Recomputes every rollup from transactions; $out swaps the collection in atomically."""
+    db.transactions.aggregate(_rollup_pipeline() + [{"$out": ROLLUPS}], allowDiskUse=True)
+    # $out keeps the indexes of an existing collection; this creates them on the first build
+    from db_utils import REQUIRED_INDEXES, ensure_indexes
+    ensure_indexes(db, {ROLLUPS: REQUIRED_INDEXES[ROLLUPS]})
+    mark_built(db, ROLLUPS)
+    return db[ROLLUPS].count_documents({})
+
+def check_consistency(db, tolerance=0.01):
+    """Differences between stored rollups and a fresh aggregation; empty list means consistent."""
+    expected = {r["_id"]: r for r in db.transactions.aggregate(_rollup_pipeline(), allowDiskUse=True)}
+    stored = {r["_id"]: r for r in db[ROLLUPS].find()}
+    problems = []
+    for key in sorted(expected.keys() | stored.keys()):
+        want, have = expected.get(key), stored.get(key)
+        if have is None:
+            problems.append({"_id": key, "problem": "missing", "expected_total": want["total"]})
+        elif want is None:
+            if have.get("count"):
+                problems.append({"_id": key, "problem": "orphan", "stored_total": have["total"]})
+        elif abs(want["total"] - have["total"]) > tolerance or want["count"] != have["count"]:
+            problems.append({"_id": key, "problem": "mismatch", "expected_total": want["total"], "stored_total": have["total"],
+                             "expected_count": want["count"], "stored_count": have["count"]})
+    return problems
+
+# --- READ PATH ---
+def category_totals(db, start_month=None, end_month=None):
+    """{category: total} over months "YYYY-MM" in [start_month, end_month] (open-ended if None)."""
+    backfill_once(db, ROLLUPS, rebuild)
+    months = {}
+    if start_month:
+        months["$gte"] = start_month
+    if end_month:
+        months["$lte"] = end_month
+    pipeline = ([{"$match": {"month": months}}] if months else []) + [
+        {"$group": {"_id": "$category", "total": {"$sum": "$total"}}},
+        {"$sort": {"total": -1}},
+    ]
+    return {r["_id"]: r["total"] for r in db[ROLLUPS].aggregate(pipeline)}
+
+def savings_total(db, categories=SAVINGS_CATEGORIES):
+    backfill_once(db, ROLLUPS, rebuild)
+    result = list(db[ROLLUPS].aggregate([
+        {"$match": {"category": {"$in": categories}}},
+        {"$group": {"_id": None, "total": {"$sum": "$total"}}},
+    ]))
+    return result[0]["total"] if result else 0
+
+if __name__ == "__main__":
+    import argparse, json, time
+    from db_utils import get_db
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["rebuild", "check"])
+    args = parser.parse_args()
+
+    db = get_db()
+    start = time.perf_counter()
+    if args.command == "rebuild":
+        print(f"Rebuilt {rebuild(db)} rollups in {time.perf_counter() - start:.1f}s")
+    else:
+        problems = check_consistency(db)
+        for p in problems:
+            print(json.dumps(p, default=str))
+        print(f"{len(problems)} inconsistent rollups ({time.perf_counter() - start:.1f}s)")
+        raise SystemExit(1 if problems else 0)
@@ -0,0 +1,126 @@
+import json, os, threading, time
+from collections import OrderedDict
+from pathlib import Path
+import numpy as np
+
+CACHE_FILE = "cache.npz"  # Entries (as JSON) and their vectors in one file, so they are replaced together
+
+def _normalize(vec):
+    vec = np.asarray(vec, dtype="float32")
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+class SemanticCache:
+    """Answer cache keyed by question embedding instead of exact question text.
+
+    A lookup returns a stored answer when the cosine similarity to a previous
+    question is at least `threshold`. Entries are evicted least-recently-used
+    beyond `max_entries` and dropped after `ttl_seconds`. The cache is shared
+    by every session in the process, so all access goes through one lock.
+    """
+
+    def __init__(self, path, threshold=0.92, max_entries=1000, ttl_seconds=7 * 24 * 3600, namespace=""):
+        self.path = Path(path)
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # Answers depend on the model and the index; a different namespace starts empty.
+        self.namespace = namespace
+        self.hits = self.misses = self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> {"question", "answer", "sources", "created"}
+        self._vectors = {}             # key -> unit-length embedding
+        self._matrix, self._keys = None, []
+        self._next_key = 0
+        self._load()
+
+    # --- Lookup & Store ---
+    def lookup(self, embedding):
+        """Returns the closest cached entry (with its similarity) or None."""
+        query = _normalize(embedding)
+        with self._lock:
+            self._drop_expired()
+            if not self._entries:
+                self.misses += 1
+                return None
+            if self._matrix is None:
+                self._keys = list(self._vectors)
+                self._matrix = np.stack([self._vectors[k] for k in self._keys])
+            sims = self._matrix @ query
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                self.misses += 1
+                return None
+            key = self._keys[best]
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(self._entries[key], similarity=float(sims[best]))
+
+    def store(self, question, embedding, answer, sources):
+        with self._lock:
+            key = self._next_key
+            self._next_key += 1
+            self._entries[key] = {"question": question, "answer": answer, "sources": list(sources), "created": time.time()}
+            self._vectors[key] = _normalize(embedding)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            self._matrix = None
+            self._save()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    # --- Internals (caller holds the lock) ---
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        self._vectors.pop(key, None)
+        self._matrix = None
+
+    def _drop_expired(self):
+        cutoff = time.time() - self.ttl_seconds
+        expired = [k for k, e in self._entries.items() if e["created"] < cutoff]
+        for key in expired:
+            self._remove(key)
+        self.evictions += len(expired)
+
+    # --- Persistence ---
+    def _save(self):
+        """Atomic rewrite; the cache is size-bounded so this stays small."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        keys = list(self._entries)
+        payload = {"namespace": self.namespace, "entries": [self._entries[k] for k in keys]}
+        dim = next(iter(self._vectors.values())).shape[0] if keys else 0
+        vectors = np.stack([self._vectors[k] for k in keys]) if keys else np.empty((0, dim), dtype="float32")
+        tmp = self.path / f"{CACHE_FILE}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, meta=np.array(json.dumps(payload)), vectors=vectors)
+        os.replace(tmp, self.path / CACHE_FILE)
+
+    def _load(self):
+        cache_path = self.path / CACHE_FILE
+        if not cache_path.exists():
+            return
+        try:
+            with np.load(cache_path) as data:
+                payload = json.loads(data["meta"].item())
+                vectors = data["vectors"]
+        except (OSError, ValueError, KeyError):
+            return
+        if payload.get("namespace") != self.namespace or len(vectors) != len(payload.get("entries", [])):
+            return
+        for entry, vec in zip(payload["entries"], vectors):
+            self._entries[self._next_key] = entry
+            self._vectors[self._next_key] = vec
+            self._next_key += 1
+        self._drop_expired()
+        self.evictions = 0
@@ -6,37 +6,26 @@ import google.generativeai as genai
 import os
 import numpy as np
 from dotenv import load_dotenv
-from db_utils import get_db  # Using your central utility file
-
-# --- PRO FEATURE: ANOMALY DETECTION ---
-def detect_anomalies_pro(df):
-    """Pro Feature: Identifies transactions that are statistically unusual."""
-    anomalies = []
-    if len(df) < 3:
-        return anomalies
-        
-    for category in df['category'].unique():
-        cat_df = df[df['category'] == category]
-        if len(cat_df) >= 3:
-            mean = cat_df['amount'].mean()
-            std = cat_df['amount'].std()
-            # Identify spending 2 standard deviations above the mean
-            spikes = cat_df[cat_df['amount'] > (mean + 2 * std)]
-            for _, row in spikes.iterrows():
-                anomalies.append(f"🚩 **Anomaly Detected**: Unusual spike in **{category}** (₹{row['amount']}) on {row['date']}")
-    return anomalies
+from db_utils import CATEGORIES, TRANSACTION_FIELDS, get_db  # Using your central utility file
+from cache_versions import bump, versioned_cache
+import rollups
+from anomalies import detect_anomalies_pro, record_and_flag  # Pro Feature: spike detection
+from statement_import import import_statement
+import rate_limiter
+from rate_limiter import RateLimitBusy
 
 # --- CRITICAL: CACHED DATA FETCHING ---
-# This stops the infinite reload loop by keeping data in memory for 60 seconds.
-@st.cache_data(ttl=60) 
+# Kept until a write bumps the transactions version (stops the infinite reload loop).
+@versioned_cache("transactions")
 def fetch_transactions_cached():
-    try:
-        db = get_db()
-        # Convert cursor to list immediately; Streamlit cannot cache lazy cursors.
-        data = list(db.transactions.find().sort("date", -1))
-        return data
-    except Exception as e:
-        return []
+    db = get_db()
+    # Convert cursor to list immediately; Streamlit cannot cache lazy cursors.
+    return list(db.transactions.find({}, TRANSACTION_FIELDS).sort("date", -1))
+
+@versioned_cache("transactions")
+def fetch_category_totals_cached():
+    """All-time spend per category, from the monthly rollups."""
+    return rollups.category_totals(get_db())
 
 def main():
     # ---------- CONFIG ----------
@@ -68,7 +57,11 @@ def main():
     """, unsafe_allow_html=True)
 
     # ---- LOAD DATA FROM CLOUD (Using Cached Function) ----
-    history_list = fetch_transactions_cached()
+    try:
+        history_list = fetch_transactions_cached()
+    except Exception as e:
+        st.error(f"Could not load transactions from the cloud: {e}")
+        history_list = []
     history_df = pd.DataFrame(history_list)
     
     if not history_df.empty:
@@ -86,7 +79,7 @@ def main():
         with st.form("transaction_form", clear_on_submit=True):
             col1, col2, col3 = st.columns(3)
             t_date = col1.date_input("Date", value=date.today())
-            t_cat = col2.selectbox("Category", ["Food", "Travel", "Entertainment", "Bills", "Shopping", "Medical", "Education", "Investments", "Insurance", "Savings", "Other"])
+            t_cat = col2.selectbox("Category", CATEGORIES)
             t_amount = col3.number_input("Amount (₹)", min_value=0.0, step=10.0)
 
             submit_button = st.form_submit_button("Log to Cloud Cluster", use_container_width=True)
@@ -100,12 +93,39 @@ def main():
                         "timestamp": datetime.now()
                     }
                     transactions_col.insert_one(new_doc)
-                    # Force cache clear so the UI updates with the new transaction
-                    st.cache_data.clear()
+                    rollups.record_transaction(db, new_doc)
+                    # O(1) check against the category's running stats, at insert time
+                    st.session_state.insert_alert = record_and_flag(db, new_doc)
+                    # Invalidate only the transaction readers so the UI shows the new entry
+                    bump("transactions")
                     st.success(f"Successfully synced ₹{t_amount} to {t_cat}!")
                     st.rerun() 
                 else:
                     st.warning("Please enter an amount greater than 0.")
+        if st.session_state.get("insert_alert"):
+            st.warning(st.session_state.pop("insert_alert"))
+
+        # ---- Bulk Import (a whole statement in a few insert_many batches, one cache bump) ----
+        with st.expander("📥 Import Bank Statement (CSV / OFX)"):
+            statement = st.file_uploader("Statement file", type=["csv", "ofx", "qfx"])
+            if statement is not None and st.button("Import Statement", use_container_width=True):
+                with st.spinner("Importing transactions..."):
+                    try:
+                        result = import_statement(db, statement, statement.name)
+                    except Exception as e:
+                        result = None
+                        bump("transactions")  # Batches before the failure are already in
+                        st.error(f"Import Failed: {e}")
+                if result:
+                    bump("transactions")
+                    st.session_state.import_result = result
+                    st.rerun()
+            result = st.session_state.pop("import_result", None)
+            if result:
+                st.success(f"Imported {result['inserted']} transactions in {result['seconds']:.1f}s "
+                           f"({result['duplicates']} already imported, {result['skipped_credits']} credits skipped, "
+                           f"{result['skipped_invalid']} unreadable rows).")
+                st.caption(" · ".join(f"{c}: {n}" for c, n in sorted(result["by_category"].items())))
         st.markdown('</div>', unsafe_allow_html=True)
 
     # ---- Data Visualization & AI Analysis ----
@@ -116,11 +136,18 @@ def main():
             st.markdown('<div class="glass-card">', unsafe_allow_html=True)
             st.subheader("📌 Category Breakdown")
             
-            cat_sum = history_df.groupby("category")["amount"].sum()
-            fig, ax = plt.subplots(figsize=(6, 6))
-            fig.patch.set_alpha(0) 
-            ax.pie(cat_sum, labels=cat_sum.index, autopct='%1.1f%%', startangle=90, textprops={'color':"white"})
-            st.pyplot(fig)
+            try:
+                cat_sum = pd.Series(fetch_category_totals_cached(), dtype="float64")
+            except Exception as e:
+                st.error(f"Could not load category totals: {e}")
+                cat_sum = pd.Series(dtype="float64")
+            if cat_sum.empty:
+                st.info("No spending recorded yet.")
+            else:
+                fig, ax = plt.subplots(figsize=(6, 6))
+                fig.patch.set_alpha(0) 
+                ax.pie(cat_sum, labels=cat_sum.index, autopct='%1.1f%%', startangle=90, textprops={'color':"white"})
+                st.pyplot(fig)
             st.markdown('</div>', unsafe_allow_html=True)
 
         with col_right:
@@ -136,21 +163,24 @@ def main():
                     st.success("✅ No unusual spending spikes detected.")
 
                 prompt = f"""
-                Analyze this spending: {history_df.tail(15).to_dict(orient='records')}
+                Analyze this spending: {history_df.head(15).to_dict(orient='records')}
                 1. Identify trends. 2. Evaluate 'Wants' vs 'Savings'. 3. Predict month-end risk.
                 Concise bullet points only.
                 """
 
                 try:
-                    model = genai.GenerativeModel("gemini-3-flash")
-                    response = model.generate_content(prompt)
+                    model_name = "gemini-3-flash"
+                    rate_limiter.acquire(api_key, model_name) # Shared quota across all sessions
+                    response = genai.GenerativeModel(model_name).generate_content(prompt)
                     st.info(response.text)
+                except RateLimitBusy:
+                    st.warning(rate_limiter.BUSY_MESSAGE)
                 except Exception as e:
                     st.error(f"AI Analysis Failed: {e}")
             st.markdown('</div>', unsafe_allow_html=True)
 
     # ---- History View ----
-    with st.expander("📜 View Full Cloud Audit Log"):
+    with st.expander("📜 View Cloud Audit Log"):
         if not history_df.empty:
             st.dataframe(history_df.sort_values(by="date", ascending=False), use_container_width=True)
         else:
@@ -0,0 +1,257 @@
+"""Bulk import of bank statements (CSV or OFX/QFX) into transactions.
+
+    python statement_import.py statement.csv            # import
+    python statement_import.py statement.ofx --dry-run  # parse + categorise only
+
+Rows are streamed, debits become transactions with a category from
+MERCHANT_RULES, and inserts go out in unordered insert_many batches. Every row
+carries a content hash with a unique index, so importing the same statement
+twice adds nothing.
+"""
+import codecs, csv, hashlib, re, time
+from datetime import datetime
+from pymongo.errors import BulkWriteError
+from db_utils import CATEGORIES
+import anomalies
+import rollups
+
+BATCH_SIZE = 1000
+DUPLICATE_KEY = 11000
+INVALID_AMOUNT = object()   # Yielded by the readers for rows whose amount cannot be parsed
+DEDUP_INDEX = "content_hash_unique"   # See db_utils.REQUIRED_INDEXES
+
+# --- MERCHANT -> CATEGORY ---
+# First match wins; everything else lands in "Other". Short tokens need \b on both
+# sides, or e.g. "rent" matches "TRF TO CURRENT A/C".
+MERCHANT_RULES = [
+    (r"swiggy|zomato|restaurant|cafe|coffee|bakery|dominos|pizza|mcdonald|\bkfc\b|grocer|bigbasket|blinkit|zepto|dmart", "Food"),
+    (r"uber|\bola\b|rapido|irctc|railway|airline|indigo|vistara|makemytrip|goibibo|redbus|hotel|fuel|petrol|metro", "Travel"),
+    (r"netflix|spotify|prime video|hotstar|bookmyshow|\bpvr\b|inox|steam|playstation", "Entertainment"),
+    (r"electricity|bescom|water bill|\bgas\b|broadband|airtel|\bjio\b|vodafone|\bvi\b|recharge|\bdth\b|\brent(al)?\b|maintenance", "Bills"),
+    (r"amazon|flipkart|myntra|ajio|nykaa|meesho|decathlon|ikea|croma", "Shopping"),
+    (r"pharma|apollo|medplus|\b1mg\b|netmeds|hospital|clinic|diagnostic|\blab\b", "Medical"),
+    (r"school|college|universit|tuition|udemy|coursera|byju|unacademy|exam fee", "Education"),
+    (r"\bsip\b|mutual fund|zerodha|groww|upstox|kuvera|\bnps\b|\bppf\b|\bstocks?\b", "Investments"),
+    (r"\blic\b|insurance|premium|policybazaar", "Insurance"),
+    (r"recurring deposit|\brd\b|fixed deposit|\bfd\b|savings transfer", "Savings"),
+]
+_RULES = [(re.compile(pattern, re.IGNORECASE), category) for pattern, category in MERCHANT_RULES]
+
+def categorize(description, given=None):
+    """Statement category if it is one of ours, else the first matching merchant rule."""
+    if given:
+        for c in CATEGORIES:
+            if c.lower() == str(given).strip().lower():
+                return c
+    for pattern, category in _RULES:
+        if pattern.search(description or ""):
+            return category
+    return "Other"
+
+# --- FIELD PARSING ---
+DATE_FORMATS = ["%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d/%m/%y", "%d-%m-%y", "%d %b %Y", "%d-%b-%Y", "%d %b %y", "%m/%d/%Y", "%Y%m%d"]
+
+_TIME_PART = re.compile(r"[T\s]+\d{1,2}:\d{2}.*$")
+_AMOUNT_NOISE = re.compile(r"\b(?:rs|inr)\b\.?|₹", re.IGNORECASE)  # Currency markers
+_DR_CR = re.compile(r"(?<![a-z])(dr|cr)\b\.?", re.IGNORECASE)   # "120 Dr", "1,500.00Cr."
+
+def parse_date(text):
+    """A date in one of DATE_FORMATS, optionally followed by a time ("2024-01-15T10:00")."""
+    text = _TIME_PART.sub("", text.strip())
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised date {text!r}")
+
+def parse_amount(text):
+    """'₹1,234.50', 'Rs. 99', '(45.00)', '-12', '12.50-', '300 Dr', '50 Cr' -> float; None for blanks and '-' placeholders.
+
+    A Dr/Cr marker sets the sign (Dr is a debit, so negative); otherwise a
+    leading or trailing minus or parentheses make the amount negative.
+    Raises ValueError for anything else that is not a number.
+    """
+    text = str(text or "")
+    marker = _DR_CR.search(text)
+    # Word tokens go first, or the "." of "Rs." / "Cr." would end up in the number
+    text = _DR_CR.sub("", _AMOUNT_NOISE.sub("", text)).strip()
+    if not text.strip("-–—"):
+        return None
+    text = re.sub(r"[^\d.\-()]", "", text)
+    negative = (text.startswith("(") and text.endswith(")")) or text.startswith("-") or text.endswith("-")
+    value = abs(float(text.strip("()-")))
+    if marker:
+        return -value if marker.group(1).lower() == "dr" else value
+    return -value if negative else value
+
+def _has_dr_cr(text):
+    """True if an amount cell carries its own Dr/Cr marker."""
+    return bool(_DR_CR.search(str(text or "")))
+
+# --- READERS (each yields (date, description, signed amount, category hint, bank id)) ---
+DATE_COLUMNS = ("date", "transaction date", "txn date", "value date", "posting date", "tran date")
+DESC_COLUMNS = ("description", "narration", "merchant", "details", "particulars", "payee", "remarks", "memo")
+DEBIT_COLUMNS = ("debit", "withdrawal", "withdrawal amt.", "withdrawal amount", "debit amount", "dr")
+CREDIT_COLUMNS = ("credit", "deposit", "deposit amt.", "deposit amount", "credit amount", "cr")
+
+def _column(fields, names):
+    normalized = {f.strip().lower(): f for f in fields if f}
+    return next((normalized[n] for n in names if n in normalized), None)
+
+def iter_csv(lines):
+    reader = csv.DictReader(lines)
+    fields = reader.fieldnames or []
+    date_col, desc_col = _column(fields, DATE_COLUMNS), _column(fields, DESC_COLUMNS)
+    debit_col, credit_col = _column(fields, DEBIT_COLUMNS), _column(fields, CREDIT_COLUMNS)
+    amount_col, cat_col = _column(fields, ("amount",)), _column(fields, ("category",))
+    type_col = _column(fields, ("type", "dr/cr", "cr/dr", "transaction type"))
+    if not date_col or not (amount_col or debit_col):
+        raise ValueError(f"Could not find date/amount columns in {fields}")
+    for row in reader:
+        try:
+            if debit_col:
+                # Separate debit / credit columns: spending is the debit side
+                debit = parse_amount(row.get(debit_col))
+                credit = parse_amount(row.get(credit_col)) if credit_col else None
+                amount = -abs(debit) if debit else (abs(credit) if credit else None)
+            else:
+                raw = row.get(amount_col)
+                amount = parse_amount(raw)
+                if amount is not None and not _has_dr_cr(raw):  # A Dr/Cr in the cell already set the sign
+                    if type_col:
+                        # Unsigned amount plus a Dr/Cr marker column
+                        amount = -abs(amount) if str(row.get(type_col, "")).strip().lower().startswith("d") else abs(amount)
+                    elif cat_col and amount > 0:
+                        amount = -amount  # App-style export: positive amounts with a category are spends
+        except ValueError:
+            amount = INVALID_AMOUNT
+        yield row.get(date_col, ""), row.get(desc_col, "") if desc_col else "", amount, row.get(cat_col) if cat_col else None, None
+
+_OFX_TAG = re.compile(r"<(\w+)>([^<\r\n]*)")
+
+def iter_ofx(lines):
+    """OFX 1.x (SGML, unclosed tags) and 2.x (XML) STMTTRN blocks, line by line."""
+    txn = None
+    for line in lines:
+        for tag, value in _OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == "STMTTRN":
+                txn = {}
+            elif txn is not None and value.strip():
+                txn[tag] = value.strip()
+        if txn is not None and "</STMTTRN>" in line.upper():
+            description = " ".join(v for v in (txn.get("NAME"), txn.get("MEMO")) if v)
+            try:
+                amount = parse_amount(txn.get("TRNAMT"))
+            except ValueError:
+                amount = INVALID_AMOUNT
+            # DTPOSTED is YYYYMMDD[HHMMSS[.XXX]][[-5:EST]]; only the date part matters
+            yield txn.get("DTPOSTED", "")[:8], description, amount, None, txn.get("FITID")
+            txn = None
+
+def iter_statement(fileobj, filename):
+    """Text lines from an upload or open file, routed to the right reader by extension."""
+    raw = fileobj.read(0)
+    lines = codecs.getreader("utf-8-sig")(fileobj, errors="replace") if isinstance(raw, bytes) else fileobj
+    return iter_ofx(lines) if filename.lower().endswith((".ofx", ".qfx")) else iter_csv(lines)
+
+def iter_transactions(fileobj, filename, stats):
+    """Transaction documents for the debits in a statement; counts skips in `stats`."""
+    seen = {}
+    now = datetime.now()
+    for date_text, description, amount, hint, bank_id in iter_statement(fileobj, filename):
+        stats["rows"] += 1
+        if amount is INVALID_AMOUNT:
+            stats["skipped_invalid"] += 1
+            continue
+        if amount is None or amount >= 0:
+            stats["skipped_credits"] += 1
+            continue
+        try:
+            day = parse_date(date_text)
+        except ValueError:
+            stats["skipped_invalid"] += 1
+            continue
+        amount = round(-amount, 2)
+        description = " ".join(description.split())
+        # Identical rows in one statement are real repeats (two coffees), so number them;
+        # re-importing the file reproduces the same numbers and hashes.
+        key = bank_id or f"{day}|{amount:.2f}|{description.lower()}"
+        seen[key] = seen.get(key, 0) + 1
+        yield {
+            "date": day,
+            "category": categorize(description, hint),
+            "amount": amount,
+            "description": description,
+            "timestamp": now,
+            "source": "statement",
+            "content_hash": hashlib.sha256(f"{key}#{seen[key]}".encode("utf-8")).hexdigest(),
+        }
+
+# --- IMPORT ---
+def _insert_batch(db, batch, stats):
+    """Unordered insert; duplicates (by content_hash) are counted, anything else re-raised."""
+    try:
+        db.transactions.insert_many(batch, ordered=False)
+        return batch
+    except BulkWriteError as e:
+        failed = {err["index"] for err in e.details["writeErrors"]}
+        other = [err for err in e.details["writeErrors"] if err["code"] != DUPLICATE_KEY]
+        if other:
+            raise
+        stats["duplicates"] += len(failed)
+        return [doc for i, doc in enumerate(batch) if i not in failed]
+
+def import_statement(db, fileobj, filename, batch_size=BATCH_SIZE, dry_run=False):
+    """Streams a statement into transactions; returns import stats.
+
+    Rollups and anomaly stats are updated for the inserted rows only, once per
+    batch. Callers bump the "transactions" cache version once afterwards.
+    Refuses to run without the content_hash unique index, which is what makes
+    a re-import add nothing.
+    """
+    if not dry_run and DEDUP_INDEX not in db.transactions.index_information():
+        raise RuntimeError(f"Index transactions.{DEDUP_INDEX} is missing, so a re-import would duplicate rows. "
+                           "Run `python db_utils.py` to create it.")
+    start = time.perf_counter()
+    stats = {"rows": 0, "inserted": 0, "duplicates": 0, "skipped_credits": 0, "skipped_invalid": 0, "by_category": {}}
+    batch = []
+
+    def flush():
+        inserted = batch if dry_run else _insert_batch(db, batch, stats)
+        if not dry_run:
+            rollups.record_transactions(db, inserted)
+            anomalies.record_batch(db, inserted)
+        stats["inserted"] += len(inserted)
+        for doc in inserted:
+            stats["by_category"][doc["category"]] = stats["by_category"].get(doc["category"], 0) + 1
+        batch.clear()
+
+    for doc in iter_transactions(fileobj, filename, stats):
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    stats["seconds"] = time.perf_counter() - start
+    stats["rows_per_sec"] = stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+if __name__ == "__main__":
+    import argparse, json
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="Parse and categorise without touching the database")
+    args = parser.parse_args()
+
+    db = None
+    if not args.dry_run:
+        from db_utils import get_db
+        db = get_db()
+    with open(args.path, "rb") as f:
+        result = import_statement(db, f, args.path, args.batch_size, args.dry_run)
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,36 @@
+import pytest
+
+pytest.importorskip("streamlit")
+import cache_versions
+from cache_versions import bump, versioned_cache
+
+def test_bump_makes_the_next_call_a_miss():
+    calls = []
+
+    @versioned_cache("test_goals")
+    def read_goals(user):
+        calls.append(user)
+        return len(calls)
+
+    read_goals.clear()
+    assert read_goals("u1") == 1
+    assert read_goals("u1") == 1          # Served from the cache
+    bump("test_goals")
+    assert read_goals("u1") == 2
+    assert calls == ["u1", "u1"]
+
+def test_bumping_another_collection_keeps_the_cache_warm():
+    calls = []
+
+    @versioned_cache("test_budgets")
+    def read_budgets():
+        calls.append(1)
+        return len(calls)
+
+    read_budgets.clear()
+    read_budgets()
+    bump("test_transactions")
+    read_budgets()
+    assert len(calls) == 1
+    row = next(r for r in cache_versions.stats() if r["function"].endswith("read_budgets"))
+    assert row["calls"] == 2 and row["misses"] == 1
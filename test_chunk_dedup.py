@@ -0,0 +1,52 @@
+import random
+from chunk_dedup import ChunkDeduplicator
+
+def jaccard(a, b, n=3):
+    def shingles(t):
+        w = t.split()
+        return {" ".join(w[i:i + n]) for i in range(len(w) - n + 1)}
+    sa, sb = shingles(a), shingles(b)
+    return len(sa & sb) / len(sa | sb)
+
+def edited(rng, words, vocab, edits):
+    words = list(words)
+    for _ in range(edits):
+        words[rng.randrange(len(words))] = rng.choice(vocab)
+    return " ".join(words)
+
+def test_exact_duplicates_ignore_case_and_whitespace():
+    d = ChunkDeduplicator()
+    assert not d.is_duplicate("Mutual funds pool money from many investors")
+    assert d.is_duplicate("  mutual FUNDS pool money\nfrom many investors ")
+    assert d.stats()["exact_dupes"] == 1
+
+def test_near_duplicate_is_dropped():
+    rng = random.Random(1)
+    vocab = [f"w{i}" for i in range(5000)]
+    words = [rng.choice(vocab) for _ in range(200)]
+    original, copy = " ".join(words), edited(rng, words, vocab, 1)
+    assert jaccard(original, copy) > 0.95
+    d = ChunkDeduplicator()
+    assert not d.is_duplicate(original)
+    assert d.is_duplicate(copy)
+    assert d.stats()["near_dupes"] == 1
+
+def test_similar_but_distinct_chunks_are_kept():
+    # Variants of one template share many shingles, but none reaches the threshold
+    rng = random.Random(0)
+    vocab = [f"w{i}" for i in range(400)]
+    base = [rng.choice(vocab) for _ in range(60)]
+    chunks = list(dict.fromkeys(edited(rng, base, vocab, rng.randint(8, 40)) for _ in range(1500)))
+    d = ChunkDeduplicator()
+    kept = []
+    for chunk in chunks:
+        if d.is_duplicate(chunk):
+            assert max(jaccard(chunk, k) for k in kept) >= 0.7
+        else:
+            kept.append(chunk)
+
+def test_buckets_hold_integers_only():
+    d = ChunkDeduplicator()
+    d.is_duplicate("the quick brown fox jumps over the lazy dog")
+    assert len(d._buckets) == d.bands
+    assert all(isinstance(k, int) and isinstance(v, int) for k, v in d._buckets.items())
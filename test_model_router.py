@@ -0,0 +1,185 @@
+import threading, time
+import pytest
+from model_router import (
+    COOLDOWN_S, FAILURE_THRESHOLD, PERMANENT_COOLDOWN_S,
+    AllModelsFailed, CircuitBreaker, ModelRouter, StreamInterrupted,
+)
+from rate_limiter import RateLimitBusy
+
+class ApiError(Exception):
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+class FakeClient:
+    """Scripted call/stream_call: each model maps to an answer, an exception, or a callable."""
+
+    def __init__(self, script):
+        self.script = script
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def _outcome(self, model, prompt):
+        with self._lock:
+            self.calls.append(model)
+        outcome = self.script[model]
+        if callable(outcome):
+            outcome = outcome(prompt)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    def call(self, model, prompt):
+        return self._outcome(model, prompt)
+
+    def stream_call(self, model, prompt):
+        for chunk in self._outcome(model, prompt):
+            if isinstance(chunk, BaseException):
+                raise chunk
+            yield chunk
+
+def state(router, model):
+    return next(row for row in router.snapshot() if row["model"] == model)
+
+# --- CircuitBreaker ---
+def test_breaker_opens_after_threshold_and_probes_once_after_cooldown():
+    breaker = CircuitBreaker()
+    for _ in range(FAILURE_THRESHOLD):
+        assert breaker.allow(now=0)
+        breaker.record_failure(now=0)
+    assert breaker.state == "open"
+    assert not breaker.allow(now=COOLDOWN_S - 1)
+
+    assert breaker.allow(now=COOLDOWN_S)        # The single half-open probe
+    assert breaker.state == "half_open"
+    assert not breaker.allow(now=COOLDOWN_S)    # No second request while the probe is out
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow(now=COOLDOWN_S)
+
+def test_failed_probe_reopens_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=1)
+    breaker.record_failure(now=0)
+    assert breaker.allow(now=COOLDOWN_S)
+    breaker.record_failure(now=COOLDOWN_S)
+    assert breaker.state == "open"
+    assert breaker.remaining(now=COOLDOWN_S) == COOLDOWN_S
+
+def test_released_probe_frees_the_slot():
+    breaker = CircuitBreaker(failure_threshold=1)
+    breaker.record_failure(now=0)
+    assert breaker.allow(now=COOLDOWN_S)
+    breaker.release()
+    assert breaker.allow(now=COOLDOWN_S)
+
+def test_permanent_error_opens_immediately_for_the_long_cooldown():
+    breaker = CircuitBreaker()
+    breaker.record_failure(now=0, permanent=True)
+    assert breaker.state == "open"
+    assert not breaker.allow(now=COOLDOWN_S)
+    assert breaker.allow(now=PERMANENT_COOLDOWN_S)
+
+# --- Sequential fallback ---
+def test_falls_back_to_the_next_model():
+    client = FakeClient({"a": ApiError("boom"), "b": "answer from b"})
+    router = ModelRouter(client.call, ["a", "b"])
+    assert router.generate("q") == ("answer from b", "b")
+    assert state(router, "a")["failed"] == 1 and state(router, "b")["ok"] == 1
+
+def test_open_breaker_skips_the_model():
+    client = FakeClient({"a": ApiError("boom"), "b": "ok"})
+    router = ModelRouter(client.call, ["a", "b"])
+    for _ in range(FAILURE_THRESHOLD):
+        router.generate("q")
+    client.calls.clear()
+
+    assert router.generate("q") == ("ok", "b")
+    assert client.calls == ["b"]
+    assert state(router, "a")["state"] == "open" and state(router, "a")["skipped"] == 1
+
+def test_not_found_trips_the_breaker_on_the_first_error():
+    client = FakeClient({"a": ApiError("404 NOT_FOUND", code=404), "b": "ok"})
+    router = ModelRouter(client.call, ["a", "b"])
+    router.generate("q")
+    row = state(router, "a")
+    assert row["state"] == "open"
+    assert row["cooldown_left_s"] > COOLDOWN_S
+
+    client.calls.clear()
+    router.generate("q")
+    assert client.calls == ["b"]
+
+def test_all_models_failing_raises():
+    client = FakeClient({"a": ApiError("a down"), "b": ApiError("b down")})
+    router = ModelRouter(client.call, ["a", "b"])
+    with pytest.raises(AllModelsFailed, match="a down"):
+        router.generate("q")
+
+def test_rate_limited_everywhere_is_busy_and_does_not_trip_breakers():
+    client = FakeClient({"a": RateLimitBusy("queue full"), "b": RateLimitBusy("queue full")})
+    router = ModelRouter(client.call, ["a", "b"])
+    for _ in range(FAILURE_THRESHOLD + 1):
+        with pytest.raises(RateLimitBusy):
+            router.generate("q")
+    assert state(router, "a")["state"] == "closed"
+    assert state(router, "a")["busy"] == FAILURE_THRESHOLD + 1
+
+# --- Hedging ---
+def test_hedge_starts_the_next_model_and_takes_the_first_answer():
+    release = threading.Event()
+
+    def slow(prompt):
+        release.wait(5)
+        return "slow answer"
+
+    client = FakeClient({"a": slow, "b": "fast answer"})
+    router = ModelRouter(client.call, ["a", "b"], hedge_after=0.05)
+    start = time.monotonic()
+    try:
+        assert router.generate("q") == ("fast answer", "b")
+        assert time.monotonic() - start < 1
+    finally:
+        release.set()
+
+def test_hedge_does_not_start_a_second_model_for_a_fast_answer():
+    client = FakeClient({"a": "fast", "b": "unused"})
+    router = ModelRouter(client.call, ["a", "b"], hedge_after=1)
+    assert router.generate("q") == ("fast", "a")
+    assert client.calls == ["a"]
+
+def test_hedge_falls_back_when_the_first_model_fails():
+    client = FakeClient({"a": ApiError("boom"), "b": "ok"})
+    router = ModelRouter(client.call, ["a", "b"], hedge_after=1)
+    assert router.generate("q") == ("ok", "b")
+
+# --- Streaming ---
+def test_stream_falls_back_before_the_first_chunk():
+    client = FakeClient({"a": ApiError("boom"), "b": ["Hel", "lo"]})
+    router = ModelRouter(client.call, ["a", "b"], stream_call=client.stream_call)
+    stream = router.stream("q")
+    assert "".join(stream) == "Hello"
+    assert stream.model == "b" and stream.completed and stream.text == "Hello"
+    assert state(router, "a")["failed"] == 1 and state(router, "b")["ok"] == 1
+
+def test_stream_failing_after_text_raises_with_the_partial_answer():
+    client = FakeClient({"a": ["Hel", ApiError("connection reset")], "b": ["unused"]})
+    router = ModelRouter(client.call, ["a", "b"], stream_call=client.stream_call)
+    stream = router.stream("q")
+    with pytest.raises(StreamInterrupted) as info:
+        list(stream)
+    assert info.value.partial == "Hel" and info.value.model == "a"
+    assert not stream.completed
+    assert client.calls == ["a"]
+
+def test_abandoned_stream_counts_neither_way():
+    client = FakeClient({"a": ["one", "two", "three"]})
+    router = ModelRouter(client.call, ["a"], stream_call=client.stream_call)
+    chunks = iter(router.stream("q"))
+    assert next(chunks) == "one"
+    chunks.close()
+    row = state(router, "a")
+    assert row["ok"] == 0 and row["failed"] == 0 and row["state"] == "closed"
+
+def test_stream_needs_stream_call():
+    router = ModelRouter(FakeClient({"a": "x"}).call, ["a"])
+    with pytest.raises(ValueError):
+        router.stream("q")
@@ -0,0 +1,84 @@
+import threading, time
+import pytest
+import rate_limiter
+from model_router import ModelRouter
+from rate_limiter import RateLimitBusy, TokenBucket
+
+def empty_bucket(rate_per_min=6):
+    bucket = TokenBucket(rate_per_min=rate_per_min, burst=1)
+    bucket.acquire()
+    return bucket
+
+def test_head_waiter_gets_busy_at_once_when_its_token_is_too_late():
+    bucket = empty_bucket(rate_per_min=6)   # Next token in 10 s
+    start = time.monotonic()
+    with pytest.raises(RateLimitBusy):
+        bucket.acquire(timeout=1)
+    assert time.monotonic() - start < 0.2
+
+def test_waiter_behind_the_head_gives_up_at_its_deadline_without_spinning():
+    bucket = empty_bucket(rate_per_min=6)
+    head_waiting = threading.Event()
+
+    def head():
+        head_waiting.set()
+        bucket.acquire(timeout=30)          # Holds the head of the queue for ~10 s
+
+    threading.Thread(target=head, daemon=True).start()
+    head_waiting.wait()
+    time.sleep(0.05)
+
+    waits = 0
+    real_wait = bucket._cond.wait
+
+    def counting_wait(timeout=None):
+        nonlocal waits
+        waits += 1
+        return real_wait(timeout)
+
+    bucket._cond.wait = counting_wait
+    start = time.monotonic()
+    with pytest.raises(RateLimitBusy):
+        bucket.acquire(timeout=0.5)
+    assert 0.45 <= time.monotonic() - start < 1.0
+    assert waits < 10
+
+def test_waiters_are_served_in_arrival_order():
+    bucket = empty_bucket(rate_per_min=600)  # One token every 0.1 s
+    order = []
+
+    def take(i):
+        bucket.acquire(timeout=5)
+        order.append(i)
+
+    threads = []
+    for i in range(4):
+        threads.append(threading.Thread(target=take, args=(i,)))
+        threads[-1].start()
+        time.sleep(0.01)
+    for t in threads:
+        t.join()
+    assert order == [0, 1, 2, 3]
+
+def test_full_queue_is_rejected():
+    bucket = empty_bucket(rate_per_min=6)
+    bucket.max_queue = 0
+    with pytest.raises(RateLimitBusy, match="already waiting"):
+        bucket.acquire(timeout=5)
+
+def test_fallback_chain_shares_one_deadline(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "_buckets", {})
+    models = ["a", "b", "c"]
+    for model in models:
+        rate_limiter.get_bucket("key", model).tokens = 0.0
+
+    def call(model, prompt):
+        rate_limiter.acquire("key", model, timeout=5)
+        return "ok"
+
+    router = ModelRouter(call, models)
+    start = time.monotonic()
+    with pytest.raises(RateLimitBusy):
+        with rate_limiter.request_budget(0.3):
+            router.generate("q")
+    assert time.monotonic() - start < 0.6
@@ -0,0 +1,52 @@
+import pytest
+
+pytest.importorskip("pymongo")
+pytest.importorskip("streamlit")   # Pulled in through db_utils
+from statement_import import INVALID_AMOUNT, iter_csv, parse_amount
+
+@pytest.mark.parametrize("text, expected", [
+    ("₹1,234.50", 1234.5),
+    ("Rs. 99", 99.0),
+    ("(45.00)", -45.0),
+    ("-12", -12.0),
+    ("12.50-", -12.5),
+    ("Rs.1,000.00-", -1000.0),
+    ("", None),
+    ("-", None),
+])
+def test_parse_amount_signs_and_placeholders(text, expected):
+    assert parse_amount(text) == expected
+
+@pytest.mark.parametrize("text, expected", [
+    ("300 Dr", -300.0),
+    ("1,500.00Dr.", -1500.0),
+    ("Rs. 250 DR", -250.0),
+    ("50 Cr", 50.0),
+    ("2,000.00 Cr.", 2000.0),
+    ("-75 Cr", 75.0),               # The marker wins over a stray minus
+])
+def test_parse_amount_applies_dr_cr_markers(text, expected):
+    assert parse_amount(text) == expected
+
+def test_parse_amount_rejects_text():
+    with pytest.raises(ValueError):
+        parse_amount("n/a")
+
+def test_csv_amount_column_keeps_the_sign_from_dr_cr():
+    rows = list(iter_csv([
+        "Date,Description,Amount,Category",
+        "2024-01-05,Swiggy,450.00 Dr,Food",
+        "2024-01-06,Refund,120.00 Cr,Shopping",
+        "2024-01-07,Uber,300,Travel",
+        "2024-01-08,Broken,abc,Other",
+    ]))
+    assert [r[2] for r in rows[:3]] == [-450.0, 120.0, -300.0]
+    assert rows[3][2] is INVALID_AMOUNT
+
+def test_csv_trailing_minus_with_type_column():
+    rows = list(iter_csv([
+        "Txn Date,Narration,Amount,Dr/Cr",
+        "05/01/2024,ATM WDL,500.00-,DR",
+        "06/01/2024,SALARY,1000.00,CR",
+    ]))
+    assert [r[2] for r in rows] == [-500.0, 1000.0]
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from voice_recorder import (
+    PAD_MS, TARGET_RATE, NoSpeechDetected, StubRecognizer,
+    _synthetic_wav, decode_wav, encode_wav, resample, transcribe, trim_silence,
+)
+
+def test_recording_is_sent_as_trimmed_16k_mono():
+    raw = _synthetic_wav(rate=44100, channels=2, lead_s=1.5, voice_s=2.0, tail_s=1.5)
+    stub = StubRecognizer("how much should I save")
+    text, stats = transcribe(raw, stub)
+    samples, rate = decode_wav(stub.received[0])
+    assert text == stub.text
+    assert rate == TARGET_RATE and samples.shape[1] == 1
+    assert stats["in_seconds"] == pytest.approx(5.0, abs=0.01)
+    assert stats["out_seconds"] == pytest.approx(2.0 + 2 * PAD_MS / 1000, abs=0.1)
+    assert stats["out_bytes"] * 5 < stats["in_bytes"]
+
+def test_trim_keeps_the_voiced_part_with_padding():
+    rate = TARGET_RATE
+    tone = 0.3 * np.sin(2 * np.pi * 300 * np.arange(rate) / rate)
+    samples = np.concatenate([np.zeros(rate), tone, np.zeros(2 * rate)]).astype("float32")
+    trimmed = trim_silence(samples, rate)
+    assert len(trimmed) / rate == pytest.approx(1.0 + 2 * PAD_MS / 1000, abs=0.05)
+
+def test_resample_keeps_duration_and_pitch():
+    src = 48000
+    t = np.arange(src) / src
+    out = resample(np.sin(2 * np.pi * 440 * t).astype("float32"), src, TARGET_RATE)
+    assert len(out) == TARGET_RATE
+    spectrum = np.abs(np.fft.rfft(out))
+    assert np.argmax(spectrum) == pytest.approx(440, abs=2)   # 1 s of audio: bin index == Hz
+
+def test_wav_round_trip():
+    samples = np.linspace(-0.5, 0.5, 1000, dtype="float32")
+    decoded, rate = decode_wav(encode_wav(samples, TARGET_RATE))
+    assert rate == TARGET_RATE
+    assert np.allclose(decoded[:, 0], samples, atol=1e-4)
+
+def test_silence_is_rejected_before_recognition():
+    stub = StubRecognizer()
+    with pytest.raises(NoSpeechDetected):
+        transcribe(_synthetic_wav(voice_s=0.0), stub)
+    assert stub.received == []
+
+def test_too_short_recording_is_rejected():
+    with pytest.raises(NoSpeechDetected, match="too short"):
+        trim_silence(np.zeros(10, dtype="float32"), TARGET_RATE)
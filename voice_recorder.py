@@ -1,14 +1,239 @@
-import google.generativeai as genai
-import json
-import io
-import tempfile
-from streamlit_mic_recorder import mic_recorder
-import speech_recognition as sr
-
-def main():
-    # ------------------------
-    # Your code here with proper indentation
-    pass
+"""Shared voice input: mic recording -> WAV cleanup -> speech recognition.
+
+Before recognition the recording is decoded, downmixed to mono, resampled to
+16 kHz and trimmed to the voiced part (frame-energy VAD). Browser recordings
+are usually 44.1/48 kHz stereo with a second or two of silence on each end,
+so the payload sent to the recognizer shrinks several-fold.
+
+    python voice_recorder.py --recognizer sphinx  # time raw vs cleaned recognition
+
+The preprocessing itself is covered by test_voice_recorder.py.
+"""
+import io, logging, os, struct, time, wave
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+TARGET_RATE = 16000
+FRAME_MS = 30
+SILENCE_FLOOR_DB = -50.0    # Frames quieter than this (dBFS) never count as voice
+DYNAMIC_RANGE_DB = 35.0     # ...nor do frames this far below the loudest frame
+PAD_MS = 200                # Kept around the voiced part so word edges aren't clipped
+STT_BACKEND = os.getenv("FIBOT_STT_BACKEND", "google")
+
+class NoSpeechDetected(Exception):
+    """The recording contains no frame loud enough to be speech."""
+
+# --- WAV DECODE / ENCODE ---
+def decode_wav(data):
+    """WAV bytes -> (float32 samples shaped [n, channels] in [-1, 1], sample rate).
+
+    Parses the RIFF chunks directly because browsers may send IEEE-float or
+    WAVE_FORMAT_EXTENSIBLE files, which the wave module rejects.
+    """
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        raise ValueError("Not a RIFF/WAVE file")
+    pos, fmt, payload = 12, None, None
+    while pos + 8 <= len(data):
+        chunk_id, size = data[pos:pos + 4], struct.unpack("<I", data[pos + 4:pos + 8])[0]
+        body = data[pos + 8:pos + 8 + size]
+        if chunk_id == b"fmt ":
+            tag, channels, rate, _, _, bits = struct.unpack("<HHIIHH", body[:16])
+            if tag == 0xFFFE:  # Extensible: the real format tag starts the sub-format GUID
+                tag = struct.unpack("<H", body[24:26])[0]
+            fmt = (tag, channels, rate, bits)
+        elif chunk_id == b"data":
+            payload = body
+        pos += 8 + size + (size & 1)
+    if fmt is None or payload is None:
+        raise ValueError("WAV file has no fmt or data chunk")
+
+    tag, channels, rate, bits = fmt
+    width = bits // 8
+    payload = payload[:len(payload) - len(payload) % (width * channels)]
+    if tag == 3 and bits in (32, 64):
+        samples = np.frombuffer(payload, dtype=f"<f{width}").astype("float32")
+    elif tag == 1 and bits == 8:
+        samples = (np.frombuffer(payload, dtype="uint8").astype("float32") - 128) / 128
+    elif tag == 1 and bits in (16, 32):
+        samples = np.frombuffer(payload, dtype=f"<i{width}").astype("float32") / float(2 ** (bits - 1))
+    elif tag == 1 and bits == 24:
+        raw = np.frombuffer(payload, dtype="uint8").reshape(-1, 3).astype("int32")
+        ints = (raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)) << 8 >> 8  # Sign-extend
+        samples = ints.astype("float32") / float(2 ** 23)
+    else:
+        raise ValueError(f"Unsupported WAV encoding (format {tag}, {bits} bits)")
+    return samples.reshape(-1, channels), rate
+
+def encode_wav(samples, rate):
+    """Mono float samples -> 16-bit PCM WAV bytes."""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+# --- PREPROCESSING ---
+def to_mono(samples):
+    return samples.mean(axis=1) if samples.ndim == 2 else samples
+
+def resample(samples, src_rate, dst_rate=TARGET_RATE):
+    if src_rate == dst_rate or not len(samples):
+        return samples
+    try:
+        from math import gcd
+        from scipy.signal import resample_poly  # Polyphase filter: no aliasing when downsampling
+        g = gcd(src_rate, dst_rate)
+        return resample_poly(samples, dst_rate // g, src_rate // g).astype("float32")
+    except ImportError:
+        n_out = int(round(len(samples) * dst_rate / src_rate))
+        return np.interp(np.arange(n_out) * (src_rate / dst_rate), np.arange(len(samples)), samples).astype("float32")
+
+def trim_silence(samples, rate):
+    """Cuts leading and trailing frames whose energy is below the VAD threshold."""
+    frame = max(1, rate * FRAME_MS // 1000)
+    n_frames = len(samples) // frame
+    if not n_frames:
+        raise NoSpeechDetected("Recording is too short")
+    frames = samples[:n_frames * frame].reshape(n_frames, frame)
+    energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-12)
+    threshold = max(SILENCE_FLOOR_DB, energy_db.max() - DYNAMIC_RANGE_DB)
+    voiced = np.flatnonzero(energy_db > threshold)
+    if not len(voiced):
+        raise NoSpeechDetected("No speech detected in the recording")
+    pad = rate * PAD_MS // 1000
+    start = max(0, voiced[0] * frame - pad)
+    end = min(len(samples), (voiced[-1] + 1) * frame + pad)
+    return samples[start:end]
+
+def preprocess(wav_bytes):
+    """Raw recording -> (16 kHz mono trimmed WAV bytes, stats)."""
+    start = time.perf_counter()
+    samples, rate = decode_wav(wav_bytes)
+    mono = resample(to_mono(samples), rate, TARGET_RATE)
+    voiced = trim_silence(mono, TARGET_RATE)
+    out = encode_wav(voiced, TARGET_RATE)
+    return out, {
+        "in_bytes": len(wav_bytes),
+        "out_bytes": len(out),
+        "in_seconds": len(samples) / rate,
+        "out_seconds": len(voiced) / TARGET_RATE,
+        "preprocess_ms": (time.perf_counter() - start) * 1000,
+    }
+
+# --- RECOGNIZER BACKENDS ---
+class GoogleRecognizer:
+    """Google Web Speech API via speech_recognition (needs network)."""
+    name = "google"
+
+    def __init__(self):
+        import speech_recognition as sr
+        self._sr = sr
+        self._recognizer = sr.Recognizer()
+
+    def _audio(self, wav_bytes):
+        with self._sr.AudioFile(io.BytesIO(wav_bytes)) as source:
+            return self._recognizer.record(source)
+
+    def recognize(self, wav_bytes):
+        return self._recognizer.recognize_google(self._audio(wav_bytes))
+
+class SphinxRecognizer(GoogleRecognizer):
+    """Offline CMU Sphinx (needs the pocketsphinx package)."""
+    name = "sphinx"
+
+    def recognize(self, wav_bytes):
+        return self._recognizer.recognize_sphinx(self._audio(wav_bytes))
+
+class StubRecognizer:
+    """Returns a fixed text and keeps what it was sent, for checks without a speech engine."""
+    name = "stub"
+
+    def __init__(self, text="stub transcript"):
+        self.text = text
+        self.received = []
+
+    def recognize(self, wav_bytes):
+        self.received.append(wav_bytes)
+        return self.text
+
+RECOGNIZERS = {"google": GoogleRecognizer, "sphinx": SphinxRecognizer, "stub": StubRecognizer}
+
+def get_recognizer(name=STT_BACKEND):
+    if name not in RECOGNIZERS:
+        raise ValueError(f"Unknown speech backend {name!r}; choose from {sorted(RECOGNIZERS)}")
+    return RECOGNIZERS[name]()
+
+def transcribe(wav_bytes, recognizer=None):
+    """Returns (text, stats) for a recorded WAV."""
+    recognizer = recognizer or get_recognizer()
+    cleaned, stats = preprocess(wav_bytes)
+    start = time.perf_counter()
+    text = recognizer.recognize(cleaned)
+    stats["recognize_ms"] = (time.perf_counter() - start) * 1000
+    stats["backend"] = recognizer.name
+    return text, stats
+
+# --- STREAMLIT WIDGET ---
+def voice_input(start_prompt="🎙 Start Recording", stop_prompt="⏹ Stop Recording", key=None, **mic_kwargs):
+    """Mic button for the pages; returns the recognised text, or None if nothing new was recorded."""
+    import streamlit as st
+    from streamlit_mic_recorder import mic_recorder
+
+    if "speech_recognizer" not in st.session_state:
+        st.session_state.speech_recognizer = get_recognizer()
+    audio_data = mic_recorder(start_prompt=start_prompt, stop_prompt=stop_prompt, just_once=True,
+                              format="wav", key=key, **mic_kwargs)
+    if not audio_data:
+        return None
+    try:
+        text, stats = transcribe(audio_data["bytes"], st.session_state.speech_recognizer)
+    except NoSpeechDetected:
+        st.warning("🎙 No speech detected — please try again a little closer to the mic.")
+        return None
+    except Exception as e:
+        st.error(f"Speech recognition error: {e}")
+        return None
+    log.info("Voice: %d KB -> %d KB, preprocess %.0f ms, %s %.0f ms", stats["in_bytes"] // 1024,
+             stats["out_bytes"] // 1024, stats["preprocess_ms"], stats["backend"], stats["recognize_ms"])
+    return text
+
+# --- RECOGNIZER TIMING ---
+def _synthetic_wav(rate=44100, channels=2, lead_s=1.5, voice_s=2.0, tail_s=1.5, seed=0):
+    """Stereo 16-bit WAV: faint noise, a speech-like burst of harmonics, faint noise."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(voice_s * rate)) / rate
+    voice = sum(np.sin(2 * np.pi * f * t) / (i + 1) for i, f in enumerate((180, 360, 720, 1440)))
+    voice *= 0.3 * (0.6 + 0.4 * np.sin(2 * np.pi * 4 * t))  # Syllable-rate envelope
+    noise = lambda s: 0.001 * rng.standard_normal(int(s * rate))
+    mono = np.concatenate([noise(lead_s), voice, noise(tail_s)]).astype("float32")
+    pcm = (np.clip(np.repeat(mono[:, None], channels, axis=1), -1, 1) * 32767).astype("<i2")
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+def time_recognizer(backend):
+    """Times `backend` on the raw synthetic recording and on its cleaned version."""
+    raw = _synthetic_wav()
+    recognizer = get_recognizer(backend)
+    for label, payload in (("raw", raw), ("cleaned", preprocess(raw)[0])):
+        start = time.perf_counter()
+        try:
+            recognizer.recognize(payload)
+        except Exception as e:  # Synthetic tones usually come back as "unintelligible"
+            print(f"  ({type(e).__name__})", end="")
+        print(f" {backend} on {label} ({len(payload) / 1024:.0f} KB): {(time.perf_counter() - start) * 1000:.0f} ms")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recognizer", choices=sorted(RECOGNIZERS), default=STT_BACKEND)
+    time_recognizer(parser.parse_args().recognizer)